@@ -1,68 +1,72 @@
+import asyncio
+import collections
+import contextlib
+import functools
+import hashlib
+import json
 import logging
+import os
+import random
+import re
 import time
+from typing import Dict, List, Optional, Tuple
 
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import openai
+from openai import AsyncOpenAI
+from pydantic import BaseModel, Field
 
 
 logger = logging.getLogger("ai")
 
-def _split_big(text: str):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=400000,
-        chunk_overlap=0,
-        separators=["\n\n", "\n", ". ", "? ", "! ", " ", ""],
-    )
-    chunks = [c.strip() for c in splitter.split_text(text or "")]
-    return [c for c in chunks if c]
-
-
-def _llm():
-    model = "gpt-5-mini"
-    temperature = 0.2
-    logger.debug("Creating ChatOpenAI client (model=%s, temperature=%s)", model, temperature)
-    return ChatOpenAI(temperature=temperature, model=model)
-
-
-def _clamp_sentiment(value: int) -> int:
-    if value < 0:
-        return 0
-    if value > 10:
-        return 10
-    return value
-
-
-def generate_clean_summary_sentiment(text: str):
-    """Generate cleaned transcription, summary, and sentiment (0-10).
-
-    Splits very long transcripts into large chunks to stay within model context.
-    """
-
-    started_at = time.monotonic()
-    input_len = len(text or "")
-    logger.debug("AI pipeline start (input_len=%d)", input_len)
-
-    chunks = _split_big(text)
-    if not chunks:
-        logger.warning("AI pipeline: empty input")
-        return "", "", None
-
-    logger.debug(
-        "AI pipeline: split input into %d chunk(s) (chunk_lens=%s)",
-        len(chunks),
-        [len(c) for c in chunks],
-    )
-
-    llm = _llm()
-
-    clean_prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                """
+# gpt-5 models only accept the default temperature, so none is sent.
+_MODEL = "gpt-5-mini"
+
+# (context window, max output) in tokens for the models we use.
+_MODEL_TOKEN_LIMITS = {
+    "gpt-5-mini": (400000, 128000),
+}
+_DEFAULT_TOKEN_LIMITS = (128000, 16384)
+_CHARS_PER_TOKEN = 4
+# Preferred cut points, highest priority first.
+_SPLIT_SEPARATORS = ("\n\n", "\n", ". ", "? ", "! ", " ")
+
+# Upper bound on concurrent per-chunk LLM calls in the map stages.
+_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+
+# Provider rate-limit budgets (requests / estimated tokens per minute); 0 disables.
+_MAX_RPM = int(os.getenv("AI_MAX_RPM", "0"))
+_MAX_TPM = int(os.getenv("AI_MAX_TPM", "0"))
+
+# Transient OpenAI errors are retried with jittered exponential backoff.
+_RETRY_ATTEMPTS = 6
+_RETRY_MIN_SECONDS = 1.0
+_RETRY_MAX_SECONDS = 30.0
+_RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+# Seconds between status polls of a submitted OpenAI batch.
+_BATCH_POLL_SECONDS = float(os.getenv("AI_BATCH_POLL_SECONDS", "30"))
+_BATCH_TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+# Above this many chunk summaries (or _CHUNK_SIZE characters of them), merge
+# them pairwise in parallel before the final reduce.
+_TREE_REDUCE_MAX_SUMMARIES = 8
+# Maximum number of chunks summarized by one Batch API request.
+_SUMMARIZE_GROUP_SIZE = 5
+# Characters taken from the head, middle and tail of a transcript for sentiment.
+_SENTIMENT_SLICE_CHARS = 2000
+_SUMMARY_MARKER_RE = re.compile(r"^===SUMMARY (\d+)===[ \t]*$", re.MULTILINE)
+
+# Transcripts shorter than this, with few fragmented lines, skip cleaning.
+_CLEAN_MIN_CHARS = 4000
+# Share of lines with fewer than 4 words above which a transcript needs cleaning.
+_MAX_FRAGMENT_RATIO = 0.3
+
+# Optional on-disk cache of per-chunk clean/summarize outputs; disabled when unset.
+_CACHE_DIR = (os.getenv("AI_CACHE_DIR") or "").strip()
+
+# System prompts are static and always sent first, so every call shares a
+# byte-identical prefix that OpenAI's automatic prompt caching can reuse.
+# Only the user message carries the variable {text}.
+_CLEAN_SYSTEM_PROMPT = """
 You are given a multi-speaker transcription where overlapping speech caused sentences to be split into single words.
 Speaker labels are alternated line by line, even when the same speaker is continuing the same sentence.
 
@@ -128,37 +132,16 @@ Mario Rossi: niente
 Output:
 Mario Rossi: Non ho capito niente
 Maria Bianchi: Sì? dimmi pure
-                """.strip(),
-            ),
-            (
-                "human",
-                """
+""".strip()
+
+_CLEAN_HUMAN_PROMPT = """
 # Input Transcription:
 {text}
 
 # Output:
-""".strip(),
-            ),
-        ]
-    )
-    clean_chain = clean_prompt | llm
+""".strip()
 
-    cleaned_chunks = []
-    for idx, chunk in enumerate(chunks):
-        try:
-            logger.debug("AI pipeline: cleaning chunk %d/%d (len=%d)", idx + 1, len(chunks), len(chunk))
-            cleaned_chunks.append(clean_chain.invoke({"text": chunk}).content)
-        except Exception:
-            logger.exception("AI pipeline: failed cleaning chunk %d/%d", idx + 1, len(chunks))
-            raise
-    cleaned = "\n\n".join([c.strip() for c in cleaned_chunks if c and c.strip()]).strip()
-    logger.debug("AI pipeline: cleaned_len=%d", len(cleaned))
-
-    summarize_chunk_prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                """
+_SUMMARIZE_CHUNK_SYSTEM_PROMPT = """
 The provided text is a transcription of a conversation.
 Summarize this chunk concisely.
 - Do NOT change speaker labels.
@@ -168,37 +151,34 @@ Summarize this chunk concisely.
 - Same language as input.
 - Do NOT add explanations, comments, or preambles.
 - Output ONLY the summary.
-                """.strip(),
-            ),
-            (
-                "human",
-                """
+""".strip()
+
+_SUMMARIZE_CHUNK_HUMAN_PROMPT = """
 # Input chunk:
 {text}
 
 # Output:
-""".strip(),
-            ),
-        ]
-    )
-    summarize_chunk_chain = summarize_chunk_prompt | llm
+""".strip()
 
-    chunk_summaries = []
-    summarize_chunks = _split_big(cleaned)
-    logger.debug("AI pipeline: summarizing %d cleaned chunk(s)", len(summarize_chunks))
-    for idx, chunk in enumerate(summarize_chunks):
-        try:
-            logger.debug("AI pipeline: summarizing chunk %d/%d (len=%d)", idx + 1, len(summarize_chunks), len(chunk))
-            chunk_summaries.append(summarize_chunk_chain.invoke({"text": chunk}).content)
-        except Exception:
-            logger.exception("AI pipeline: failed summarizing chunk %d/%d", idx + 1, len(summarize_chunks))
-            raise
+# Summarizing several chunks in one request amortizes the static prompt.
+_MULTI_SUMMARIZE_SYSTEM_PROMPT = """
+The provided text contains several numbered chunks of conversation transcriptions, each starting with a line like ===CHUNK 1===.
+Summarize each chunk separately and concisely.
+- Do NOT change speaker labels.
+- Capture main points and important details.
+- No opinions.
+- Keep speaker names or labels if present.
+- Same language as input.
+- Do NOT add explanations, comments, or preambles.
+- For every chunk, output a line ===SUMMARY n=== (n being the chunk number) followed by its summary.
+- Output ONLY the summaries.
+""".strip()
 
-    reduce_prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                """
+_MULTI_SUMMARIZE_HUMAN_PROMPT = """
+{text}
+""".strip()
+
+_REDUCE_SYSTEM_PROMPT = """
 You are given bullet summaries of chunks of a conversation.
 Merge them into a single concise summary.
 - Keep bullet points.
@@ -207,64 +187,505 @@ Merge them into a single concise summary.
 - Make sure every important point from the chunks is included.
 - Same language as the summaries.
 No preamble or conclusion.
-                """.strip(),
-            ),
-            (
-                "human",
-                """
+""".strip()
+
+_REDUCE_HUMAN_PROMPT = """
 {text}
-""".strip(),
-            ),
-        ]
-    )
-    reduce_chain = reduce_prompt | llm
-    try:
-        summary = reduce_chain.invoke({"text": "\n\n".join([s.strip() for s in chunk_summaries if s and s.strip()])}).content
-    except Exception:
-        logger.exception("AI pipeline: failed reducing chunk summaries")
-        raise
-    summary = (summary or "").strip()
-    logger.debug("AI pipeline: summary_len=%d", len(summary))
+""".strip()
 
-    sentiment_prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                """
+_SENTIMENT_SYSTEM_PROMPT = """
 Rate the overall sentiment expressed in the conversation on a 0-10 scale.
 0 means pure hate.
 10 means deepest love.
 
-Return ONLY a single integer from 0 to 10.
-
-example output:0
-example output:10
-example output:5
-example output:7
-example output:3
-                """.strip(),
-            ),
-            (
-                "human",
-                """
+Return the sentiment integer in `sentiment`.
+""".strip()
+
+_SENTIMENT_HUMAN_PROMPT = """
 {text}
-""".strip(),
-            ),
-        ]
+""".strip()
+
+
+# Cleaning and summarizing a chunk in a single call. The clean prompt is kept
+# verbatim as the prefix so it stays cacheable.
+_CLEAN_SUMMARIZE_SYSTEM_PROMPT = (
+    _CLEAN_SYSTEM_PROMPT
+    + "\n\n"
+    + """
+### Summary
+
+Also summarize the cleaned transcription concisely.
+- Do NOT change speaker labels.
+- Capture main points and important details.
+- No opinions.
+- Keep speaker names or labels if present.
+- Same language as input.
+- Do NOT add explanations, comments, or preambles.
+
+### Sentiment
+
+Rate the overall sentiment expressed in the conversation on a 0-10 scale.
+0 means pure hate.
+10 means deepest love.
+
+Return the cleaned transcription in `cleaned`, the summary in `summary` and the sentiment integer in `sentiment`.
+""".strip()
+)
+
+# Summarizing and scoring a transcript that is already well-formed.
+_SUMMARIZE_SENTIMENT_SYSTEM_PROMPT = """
+The provided text is a transcription of a conversation.
+Summarize it concisely.
+- Do NOT change speaker labels.
+- Capture main points and important details.
+- No opinions.
+- Keep speaker names or labels if present.
+- Same language as input.
+- Do NOT add explanations, comments, or preambles.
+
+Also rate the overall sentiment expressed in the conversation on a 0-10 scale.
+0 means pure hate.
+10 means deepest love.
+
+Return the summary in `summary` and the sentiment integer in `sentiment`.
+""".strip()
+
+# Merging chunk summaries and scoring sentiment in a single call.
+_REDUCE_SENTIMENT_SYSTEM_PROMPT = (
+    _REDUCE_SYSTEM_PROMPT
+    + "\n\n"
+    + """
+Also rate the overall sentiment expressed in the conversation on a 0-10 scale.
+0 means pure hate.
+10 means deepest love.
+
+Return the merged summary in `summary` and the sentiment integer in `sentiment`.
+""".strip()
+)
+
+# Merging summaries at the intermediate tree-reduce levels: no sentiment, only
+# the root reduce scores the whole conversation.
+_MERGE_SYSTEM_PROMPT = _REDUCE_SYSTEM_PROMPT + "\n\nReturn the merged summary in `summary`."
+
+# Structured output for the standalone sentiment request of the batch path;
+# the schema bounds make the integer safe to use without clamping.
+_SENTIMENT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "sentiment",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"sentiment": {"type": "integer", "minimum": 0, "maximum": 10}},
+            "required": ["sentiment"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+_STAGE_PROMPTS = {
+    "clean_summarize": (_CLEAN_SUMMARIZE_SYSTEM_PROMPT, _CLEAN_HUMAN_PROMPT),
+    "summarize": (_SUMMARIZE_SENTIMENT_SYSTEM_PROMPT, _SUMMARIZE_CHUNK_HUMAN_PROMPT),
+}
+
+
+class ChunkResult(BaseModel):
+    """Cleaned transcription, summary and sentiment of one transcript chunk."""
+
+    cleaned: str = Field(description="The cleaned transcription of the chunk")
+    summary: str = Field(description="A concise summary of the cleaned transcription")
+    sentiment: int = Field(ge=0, le=10, description="Overall sentiment from 0 (pure hate) to 10 (deepest love)")
+
+
+class SummaryResult(BaseModel):
+    """Summary and sentiment of a transcript chunk that needs no cleaning."""
+
+    summary: str = Field(description="A concise summary of the transcription")
+    sentiment: int = Field(ge=0, le=10, description="Overall sentiment from 0 (pure hate) to 10 (deepest love)")
+
+
+class MergedSummary(BaseModel):
+    """Merged summary of a group of chunk summaries."""
+
+    summary: str = Field(description="The merged summary of the given summaries")
+
+
+class ReducedOutput(BaseModel):
+    """Merged summary and overall sentiment of a whole transcript."""
+
+    summary: str = Field(description="The merged summary of all chunks")
+    sentiment: int = Field(ge=0, le=10, description="Overall sentiment from 0 (pure hate) to 10 (deepest love)")
+
+
+def _default_chunk_size() -> int:
+    """Largest chunk (in characters) the model can clean and summarize in one call."""
+
+    context, max_output = _MODEL_TOKEN_LIMITS.get(_MODEL, _DEFAULT_TOKEN_LIMITS)
+    prompt_tokens = len(_CLEAN_SUMMARIZE_SYSTEM_PROMPT) // _CHARS_PER_TOKEN
+    # The cleaned chunk is echoed back, so it must fit the output budget as
+    # well as the remaining context. Keep 20% headroom for the summary and
+    # for tokenization variance.
+    budget = min(context - max_output - prompt_tokens, max_output)
+    return int(budget * 0.8) * _CHARS_PER_TOKEN
+
+
+# Maximum characters per chunk sent to the model.
+_CHUNK_SIZE = int(os.getenv("AI_CHUNK_SIZE") or _default_chunk_size())
+
+
+def _split_text(text: str, chunk_size: int, separators: Tuple[str, ...] = _SPLIT_SEPARATORS) -> List[str]:
+    """Greedily split text into stripped chunks of at most chunk_size characters.
+
+    Each cut is placed after the last, highest-priority separator inside the
+    current window (paragraph, line, sentence, word), falling back to a hard
+    cut. Only str.rfind on the bounded window is used, so the text is scanned
+    once instead of recursively per separator. Also used by api.py for TTS input.
+    """
+
+    if len(text) <= chunk_size:
+        # Short text: one chunk, nothing to search.
+        text = text.strip()
+        return [text] if text else []
+    chunks = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = start + chunk_size
+        cut = length
+        if end < length:
+            cut = end
+            for separator in separators:
+                idx = text.rfind(separator, start, end)
+                if idx > start:
+                    cut = idx + len(separator)
+                    break
+        chunk = text[start:cut].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = cut
+    return chunks
+
+
+def _split_big(text: str):
+    return _split_text(text or "", _CHUNK_SIZE)
+
+
+def _join_nonempty(parts, separator: str = "\n\n") -> str:
+    """Join the stripped, non-empty parts, stripping each part only once."""
+
+    return separator.join(p for p in (part.strip() for part in parts if part) if p)
+
+
+class _RateLimiter:
+    """Sliding-window limiter allowing at most capacity units per period seconds.
+
+    Acquiring is check-and-record without awaiting in between, so it is safe for
+    concurrent tasks on one event loop without a lock.
+    """
+
+    def __init__(self, capacity: int, period: float = 60.0):
+        self.capacity = capacity
+        self.period = period
+        self._events = collections.deque()
+        self._used = 0
+
+    async def acquire(self, amount: int = 1) -> None:
+        if self.capacity <= 0:
+            return
+        amount = min(max(amount, 1), self.capacity)
+        while True:
+            now = time.monotonic()
+            while self._events and now - self._events[0][0] >= self.period:
+                self._used -= self._events.popleft()[1]
+            if self._used + amount <= self.capacity:
+                self._events.append((now, amount))
+                self._used += amount
+                return
+            await asyncio.sleep(self._events[0][0] + self.period - now)
+
+
+_rpm_limiter = _RateLimiter(_MAX_RPM)
+_tpm_limiter = _RateLimiter(_MAX_TPM)
+
+
+@contextlib.asynccontextmanager
+async def _llm_slot(semaphore: asyncio.Semaphore, prompt_chars: int):
+    """Wait for a concurrency slot and RPM/TPM budget before an LLM call."""
+
+    async with semaphore:
+        await _rpm_limiter.acquire()
+        await _tpm_limiter.acquire(prompt_chars // _CHARS_PER_TOKEN)
+        yield
+
+
+def _summarize_inputs(cleaned: str) -> List[str]:
+    # The cleaned text usually fits in one chunk already; skip re-splitting it.
+    if 0 < len(cleaned) <= _CHUNK_SIZE:
+        return [cleaned]
+    return _split_big(cleaned)
+
+
+@functools.lru_cache(maxsize=1)
+def _client() -> AsyncOpenAI:
+    """Return the shared OpenAI client, created on first use."""
+    logger.debug("Creating OpenAI client (model=%s)", _MODEL)
+    return AsyncOpenAI()
+
+
+@functools.lru_cache(maxsize=1)
+def _completions_client() -> AsyncOpenAI:
+    """Return the shared client without SDK retries, for the calls _call_llm retries itself."""
+    # with_options copies the client but shares its connection pool; the batch
+    # path keeps the SDK's default retries on _client().
+    return _client().with_options(max_retries=0)
+
+
+@functools.lru_cache(maxsize=None)
+def _prompt_template(system_prompt: str, human_prompt: str) -> Tuple[dict, str, str]:
+    """Precompile a prompt pair into its system message and the user text around {text}."""
+
+    prefix, _, suffix = human_prompt.partition("{text}")
+    return {"role": "system", "content": system_prompt}, prefix, suffix
+
+
+def _messages(system_prompt: str, human_prompt: str, text: str) -> List[dict]:
+    system_message, prefix, suffix = _prompt_template(system_prompt, human_prompt)
+    return [system_message, {"role": "user", "content": prefix + text + suffix}]
+
+
+def _fragment_ratio(text: str) -> float:
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return 0.0
+    return sum(1 for line in lines if len(line.split()) < 4) / len(lines)
+
+
+def _needs_cleaning(text: str) -> bool:
+    """Return False for short transcripts whose lines are already whole sentences."""
+
+    return len(text) > _CLEAN_MIN_CHARS or _fragment_ratio(text) > _MAX_FRAGMENT_RATIO
+
+
+def _sentiment_sample(cleaned: str) -> str:
+    """Return head, middle and tail slices so sentiment covers the whole conversation."""
+
+    size = _SENTIMENT_SLICE_CHARS
+    if len(cleaned) <= 3 * size:
+        return cleaned
+    middle = (len(cleaned) - size) // 2
+    return "\n...\n".join([cleaned[:size], cleaned[middle : middle + size], cleaned[-size:]])
+
+
+def _log_usage(stage: str, completion) -> None:
+    usage = completion.usage
+    if usage is None or not logger.isEnabledFor(logging.DEBUG):
+        return
+    details = usage.prompt_tokens_details
+    logger.debug(
+        "AI usage %s: input_tokens=%s cached_tokens=%s output_tokens=%s",
+        stage,
+        usage.prompt_tokens,
+        details.cached_tokens if details is not None else None,
+        usage.completion_tokens,
     )
-    sentiment_chain = sentiment_prompt | llm
 
+
+async def _parse(stage: str, system_prompt: str, human_prompt: str, text: str, response_format):
+    """Run one structured-output chat completion and return the parsed model."""
+
+    # Retries are handled by _call_llm so each attempt goes through the limiters.
+    completion = await _completions_client().chat.completions.parse(
+        model=_MODEL,
+        messages=_messages(system_prompt, human_prompt, text),
+        response_format=response_format,
+    )
+    _log_usage(stage, completion)
+    parsed = completion.choices[0].message.parsed
+    if parsed is None:
+        raise ValueError(f"Model returned no structured output for stage {stage}")
+    return parsed
+
+
+async def _call_llm(
+    stage: str, system_prompt: str, human_prompt: str, text: str, response_format, semaphore: asyncio.Semaphore
+):
+    """Run _parse within the concurrency and rate limits, retrying transient failures."""
+
+    for attempt in range(1, _RETRY_ATTEMPTS + 1):
+        try:
+            async with _llm_slot(semaphore, len(system_prompt) + len(text)):
+                return await _parse(stage, system_prompt, human_prompt, text, response_format)
+        except _RETRYABLE_ERRORS as e:
+            if attempt == _RETRY_ATTEMPTS:
+                raise
+            delay = max(_RETRY_MIN_SECONDS, random.uniform(0, min(_RETRY_MAX_SECONDS, _RETRY_MIN_SECONDS * 2**attempt)))
+            logger.warning(
+                "AI %s call failed (attempt %d/%d): %s; retrying in %.1fs",
+                stage,
+                attempt,
+                _RETRY_ATTEMPTS,
+                e,
+                delay,
+            )
+            await asyncio.sleep(delay)
+
+
+def _cache_key(stage: str, text: str) -> str:
+    # Prompts are part of the key so editing them invalidates stale entries.
+    digest = hashlib.sha256()
+    for part in (_MODEL, stage, *_STAGE_PROMPTS[stage], text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(_CACHE_DIR, key[:2], key)
+
+
+def _cache_get(key: str) -> Optional[str]:
+    try:
+        with open(_cache_path(key), "r", encoding="utf-8") as cache_file:
+            return cache_file.read()
+    except FileNotFoundError:
+        return None
+    except OSError:
+        logger.warning("AI cache read failed (key=%s)", key, exc_info=True)
+        return None
+
+
+def _cache_put(key: str, value: str) -> None:
+    path = _cache_path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as cache_file:
+            cache_file.write(value)
+        os.replace(tmp_path, path)
+    except OSError:
+        logger.warning("AI cache write failed (key=%s)", key, exc_info=True)
+
+
+async def _cached_parse(stage: str, text: str, response_format, semaphore: asyncio.Semaphore):
+    """Run a structured-output stage on text, serving repeated inputs from the AI_CACHE_DIR cache."""
+
+    key = _cache_key(stage, text) if _CACHE_DIR else None
+    if key is not None:
+        output = _cache_get(key)
+        if output is not None:
+            logger.debug("AI cache hit (stage=%s)", stage)
+            return response_format.model_validate_json(output)
+
+    system_prompt, human_prompt = _STAGE_PROMPTS[stage]
+    parsed = await _call_llm(stage, system_prompt, human_prompt, text, response_format, semaphore)
+    if key is not None:
+        _cache_put(key, parsed.model_dump_json())
+    return parsed
+
+
+async def _gather_or_cancel(coros) -> list:
+    """Gather coroutines as tasks, cancelling the rest if one of them fails."""
+
+    tasks = [asyncio.create_task(c) for c in coros]
     try:
-        sentiment_text = sentiment_chain.invoke({"text": cleaned[:20000]}).content
-    except Exception:
-        logger.exception("AI pipeline: failed sentiment scoring")
-        raise
-    sentiment = None
-    if sentiment_text is not None:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _reduce(summaries: List[str], semaphore: asyncio.Semaphore) -> ReducedOutput:
+    return await _call_llm(
+        "reduce", _REDUCE_SENTIMENT_SYSTEM_PROMPT, _REDUCE_HUMAN_PROMPT, _join_nonempty(summaries), ReducedOutput, semaphore
+    )
+
+
+async def _merge(summaries: List[str], semaphore: asyncio.Semaphore) -> MergedSummary:
+    return await _call_llm(
+        "merge", _MERGE_SYSTEM_PROMPT, _REDUCE_HUMAN_PROMPT, _join_nonempty(summaries), MergedSummary, semaphore
+    )
+
+
+async def _tree_reduce(summaries: List[str], semaphore: asyncio.Semaphore) -> ReducedOutput:
+    """Merge summaries pairwise, one parallel level at a time, then reduce the rest.
+
+    Keeps every reduce prompt bounded and makes latency grow with log(k)
+    rather than with the size of a single flat reduce over k summaries.
+    """
+
+    async def _merge_pair(pair: List[str]) -> str:
+        if len(pair) == 1:
+            return pair[0]
+        return (await _merge(pair, semaphore)).summary
+
+    level = 0
+    while len(summaries) > 2 and (
+        len(summaries) > _TREE_REDUCE_MAX_SUMMARIES or len(_join_nonempty(summaries)) > _CHUNK_SIZE
+    ):
+        level += 1
+        logger.debug("AI pipeline: tree reduce level %d (summaries=%d)", level, len(summaries))
+        pairs = [summaries[i : i + 2] for i in range(0, len(summaries), 2)]
+        summaries = await _gather_or_cancel(_merge_pair(pair) for pair in pairs)
+    return await _reduce(summaries, semaphore)
+
+
+async def generate_clean_summary_sentiment(text: str):
+    """Generate cleaned transcription, summary, and sentiment (0-10).
+
+    Splits very long transcripts into large chunks to stay within model context.
+    Each chunk is cleaned, summarized and scored by a single structured-output
+    call (short, well-formed chunks are only summarized and scored); multiple
+    chunks are then merged by a reduce call that also rates
+    the overall sentiment, pairwise in a tree when there are many of them.
+    """
+
+    started_at = time.monotonic()
+    input_len = len(text or "")
+    logger.debug("AI pipeline start (input_len=%d)", input_len)
+
+    chunks = _split_big(text)
+    if not chunks:
+        logger.warning("AI pipeline: empty input")
+        return "", "", None
+
+    logger.debug(
+        "AI pipeline: split input into %d chunk(s) (chunk_lens=%s)",
+        len(chunks),
+        [len(c) for c in chunks],
+    )
+
+    semaphore = asyncio.Semaphore(_MAX_CONCURRENCY)
+
+    async def _clean_summarize_chunk(idx: int, chunk: str) -> ChunkResult:
         try:
-            sentiment = _clamp_sentiment(int(sentiment_text.strip()))
+            if not _needs_cleaning(chunk):
+                logger.debug("AI pipeline: chunk %d/%d is well-formed, skipping cleaning", idx + 1, len(chunks))
+                result = await _cached_parse("summarize", chunk, SummaryResult, semaphore)
+                return ChunkResult(cleaned=chunk, summary=result.summary, sentiment=result.sentiment)
+            logger.debug("AI pipeline: cleaning+summarizing chunk %d/%d (len=%d)", idx + 1, len(chunks), len(chunk))
+            return await _cached_parse("clean_summarize", chunk, ChunkResult, semaphore)
         except Exception:
-            sentiment = None
+            logger.exception("AI pipeline: failed cleaning+summarizing chunk %d/%d", idx + 1, len(chunks))
+            raise
+
+    chunk_results = await _gather_or_cancel(_clean_summarize_chunk(idx, chunk) for idx, chunk in enumerate(chunks))
+
+    cleaned = _join_nonempty(r.cleaned for r in chunk_results)
+    logger.debug("AI pipeline: cleaned_len=%d", len(cleaned))
+
+    if len(chunk_results) == 1:
+        # Nothing to merge: the chunk summary and sentiment are the final ones.
+        summary, sentiment = chunk_results[0].summary, chunk_results[0].sentiment
+    else:
+        try:
+            reduced = await _tree_reduce([r.summary for r in chunk_results], semaphore)
+        except Exception:
+            logger.exception("AI pipeline: failed reducing chunk summaries")
+            raise
+        summary, sentiment = reduced.summary, reduced.sentiment
+    summary = (summary or "").strip()
+    logger.debug("AI pipeline: summary_len=%d", len(summary))
 
     elapsed_ms = int((time.monotonic() - started_at) * 1000)
     logger.info(
@@ -276,3 +697,219 @@ example output:3
     )
 
     return cleaned, summary, sentiment
+
+
+def _batch_request(
+    custom_id: str, system_prompt: str, human_prompt: str, text: str, response_format: Optional[dict] = None
+) -> dict:
+    body = {"model": _MODEL, "messages": _messages(system_prompt, human_prompt, text)}
+    if response_format is not None:
+        body["response_format"] = response_format
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": body,
+    }
+
+
+async def _run_batch(client: AsyncOpenAI, requests: List[dict]) -> Dict[str, str]:
+    """Submit requests through the OpenAI Batch API and return contents keyed by custom_id."""
+
+    if not requests:
+        return {}
+
+    payload = "\n".join(json.dumps(r) for r in requests).encode("utf-8")
+    input_file = await client.files.create(file=("batch.jsonl", payload), purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    logger.info("AI batch submitted (batch_id=%s requests=%d)", batch.id, len(requests))
+
+    while batch.status not in _BATCH_TERMINAL_STATUSES:
+        await asyncio.sleep(_BATCH_POLL_SECONDS)
+        batch = await client.batches.retrieve(batch.id)
+        logger.debug("AI batch %s status=%s", batch.id, batch.status)
+
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"OpenAI batch {batch.id} ended with status={batch.status}")
+
+    output = await client.files.content(batch.output_file_id)
+    results: Dict[str, str] = {}
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        response = item.get("response") or {}
+        if item.get("error") or response.get("status_code") != 200:
+            raise RuntimeError(f"OpenAI batch request {item.get('custom_id')} failed: {item.get('error') or response}")
+        results[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"] or ""
+
+    missing = [r["custom_id"] for r in requests if r["custom_id"] not in results]
+    if missing:
+        raise RuntimeError(f"OpenAI batch {batch.id} is missing {len(missing)} result(s)")
+    return results
+
+
+def _group_for_summary(items: List[Tuple[int, int, str]]) -> List[List[Tuple[int, int, str]]]:
+    """Group (doc_idx, chunk_idx, text) items so each group fits in one summarize request."""
+
+    groups: List[List[Tuple[int, int, str]]] = []
+    group_len = 0
+    for item in items:
+        if groups and len(groups[-1]) < _SUMMARIZE_GROUP_SIZE and group_len + len(item[2]) <= _CHUNK_SIZE:
+            groups[-1].append(item)
+            group_len += len(item[2])
+        else:
+            groups.append([item])
+            group_len = len(item[2])
+    return groups
+
+
+def _parse_multi_summary(text: str, count: int) -> Dict[int, str]:
+    """Split a ===SUMMARY n=== response into summaries keyed by 0-based chunk position."""
+
+    summaries: Dict[int, str] = {}
+    markers = list(_SUMMARY_MARKER_RE.finditer(text or ""))
+    for pos, marker in enumerate(markers):
+        number = int(marker.group(1))
+        end = markers[pos + 1].start() if pos + 1 < len(markers) else len(text)
+        summary = text[marker.end() : end].strip()
+        if 1 <= number <= count and summary:
+            summaries[number - 1] = summary
+    return summaries
+
+
+async def generate_clean_summary_sentiment_batched(texts: List[str]) -> List[Tuple[str, str, Optional[int]]]:
+    """Batch API variant of generate_clean_summary_sentiment for offline backlogs.
+
+    Every stage is submitted as one OpenAI batch covering all texts, which halves
+    token cost at the price of latency (minutes up to 24h). Results are returned
+    in the same order as texts.
+    """
+
+    started_at = time.monotonic()
+    client = _client()
+
+    doc_chunks = [_split_big(text) for text in texts]
+    logger.info(
+        "AI batch pipeline start (documents=%d chunks=%d)",
+        len(texts),
+        sum(len(chunks) for chunks in doc_chunks),
+    )
+
+    clean_results = await _run_batch(
+        client,
+        [
+            _batch_request(f"{doc_idx}:clean:{idx}", _CLEAN_SYSTEM_PROMPT, _CLEAN_HUMAN_PROMPT, chunk)
+            for doc_idx, chunks in enumerate(doc_chunks)
+            for idx, chunk in enumerate(chunks)
+            if _needs_cleaning(chunk)
+        ],
+    )
+    cleaned_docs = []
+    for doc_idx, chunks in enumerate(doc_chunks):
+        # Well-formed chunks were not submitted and are used as they are.
+        cleaned_chunks = [clean_results.get(f"{doc_idx}:clean:{idx}", chunk) for idx, chunk in enumerate(chunks)]
+        cleaned_docs.append(_join_nonempty(cleaned_chunks))
+
+    # Chunk summaries and sentiment only depend on the cleaned text: one batch.
+    # Chunks (across documents) are packed several per summarize request.
+    summarize_chunks = [_summarize_inputs(cleaned) for cleaned in cleaned_docs]
+    groups = _group_for_summary(
+        [
+            (doc_idx, idx, chunk)
+            for doc_idx, cleaned in enumerate(cleaned_docs)
+            if cleaned
+            for idx, chunk in enumerate(summarize_chunks[doc_idx])
+        ]
+    )
+    requests = []
+    for group_idx, group in enumerate(groups):
+        if len(group) == 1:
+            doc_idx, idx, chunk = group[0]
+            requests.append(
+                _batch_request(
+                    f"{doc_idx}:summarize:{idx}", _SUMMARIZE_CHUNK_SYSTEM_PROMPT, _SUMMARIZE_CHUNK_HUMAN_PROMPT, chunk
+                )
+            )
+        else:
+            requests.append(
+                _batch_request(
+                    f"group:summarize:{group_idx}",
+                    _MULTI_SUMMARIZE_SYSTEM_PROMPT,
+                    _MULTI_SUMMARIZE_HUMAN_PROMPT,
+                    "\n\n".join(f"===CHUNK {pos}===\n{chunk}" for pos, (_, _, chunk) in enumerate(group, start=1)),
+                )
+            )
+    for doc_idx, cleaned in enumerate(cleaned_docs):
+        if cleaned:
+            requests.append(
+                _batch_request(
+                    f"{doc_idx}:sentiment:0",
+                    _SENTIMENT_SYSTEM_PROMPT,
+                    _SENTIMENT_HUMAN_PROMPT,
+                    _sentiment_sample(cleaned),
+                    _SENTIMENT_RESPONSE_FORMAT,
+                )
+            )
+    map_results = await _run_batch(client, requests)
+
+    # Unpack grouped responses; chunks whose summary could not be parsed are
+    # resubmitted one per request.
+    retry_requests = []
+    for group_idx, group in enumerate(groups):
+        if len(group) == 1:
+            continue
+        parsed = _parse_multi_summary(map_results[f"group:summarize:{group_idx}"], len(group))
+        for pos, (doc_idx, idx, chunk) in enumerate(group):
+            if pos in parsed:
+                map_results[f"{doc_idx}:summarize:{idx}"] = parsed[pos]
+            else:
+                retry_requests.append(
+                    _batch_request(
+                        f"{doc_idx}:summarize:{idx}", _SUMMARIZE_CHUNK_SYSTEM_PROMPT, _SUMMARIZE_CHUNK_HUMAN_PROMPT, chunk
+                    )
+                )
+    if retry_requests:
+        logger.warning("AI batch pipeline: resubmitting %d unparsed grouped summaries", len(retry_requests))
+        map_results.update(await _run_batch(client, retry_requests))
+
+    summaries: Dict[int, str] = {}
+    reduce_requests = []
+    for doc_idx, cleaned in enumerate(cleaned_docs):
+        if not cleaned:
+            continue
+        chunk_summaries = [map_results[f"{doc_idx}:summarize:{idx}"] for idx in range(len(summarize_chunks[doc_idx]))]
+        if len(chunk_summaries) == 1:
+            summaries[doc_idx] = chunk_summaries[0]
+            continue
+        reduce_requests.append(
+            _batch_request(
+                f"{doc_idx}:reduce:0",
+                _REDUCE_SYSTEM_PROMPT,
+                _REDUCE_HUMAN_PROMPT,
+                _join_nonempty(chunk_summaries),
+            )
+        )
+    reduce_results = await _run_batch(client, reduce_requests)
+    for doc_idx in range(len(cleaned_docs)):
+        if f"{doc_idx}:reduce:0" in reduce_results:
+            summaries[doc_idx] = reduce_results[f"{doc_idx}:reduce:0"]
+
+    results: List[Tuple[str, str, Optional[int]]] = []
+    for doc_idx, cleaned in enumerate(cleaned_docs):
+        if not cleaned:
+            results.append(("", "", None))
+            continue
+        summary = (summaries[doc_idx] or "").strip()
+        # Empty content means the model refused to answer.
+        sentiment_output = map_results[f"{doc_idx}:sentiment:0"]
+        sentiment = json.loads(sentiment_output)["sentiment"] if sentiment_output else None
+        results.append((cleaned, summary, sentiment))
+
+    elapsed_ms = int((time.monotonic() - started_at) * 1000)
+    logger.info("AI batch pipeline done (documents=%d elapsed_ms=%d)", len(texts), elapsed_ms)
+    return results
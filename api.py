@@ -1,27 +1,85 @@
-from fastapi import APIRouter, Depends, FastAPI, HTTPException, UploadFile, File, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, FastAPI, HTTPException, UploadFile, File, Request
 from fastapi.concurrency import run_in_threadpool
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, Response
+import asyncio
 import re
 import uuid
-import json
+import hmac
+import io
+import importlib.util
+import anyio.to_thread
 import httpx
+import orjson
 import os
 import logging
-import subprocess
-import sys
+import multiprocessing
 import shutil
 import tempfile
+import time
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from contextlib import asynccontextmanager
+from functools import partial
 from deepgram import DeepgramClient, SpeakOptions
+from pydantic import BaseModel
+from starlette.datastructures import FormData, Headers
+from starlette.formparsers import MultiPartException
 from deepgram.clients.common.v1.errors import DeepgramApiError
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 
+import ai
 import db
 
-app = FastAPI()
 logger = logging.getLogger("api")
 
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")  # Ensure this environment variable is set
+_DEEPGRAM_AUTHORIZATION = f"Token {DEEPGRAM_API_KEY}"
+# AI enrichment runs only when an OpenAI key is configured.
+OPENAI_ENABLED = bool(os.getenv("OPENAI_API_KEY"))
+DEEPGRAM_TIMEOUT_SECONDS = float(os.getenv("DEEPGRAM_TIMEOUT_SECONDS", "300"))
+DEEPGRAM_TIMEOUT = httpx.Timeout(
+    connect=10.0,
+    read=DEEPGRAM_TIMEOUT_SECONDS,
+    write=DEEPGRAM_TIMEOUT_SECONDS,
+    pool=10.0,
+)
+# Connection pool shared by all requests to Deepgram.
+DEEPGRAM_POOL_LIMITS = httpx.Limits(
+    max_connections=max(1, int(os.getenv("DEEPGRAM_POOL_MAX_CONNECTIONS", "100"))),
+    max_keepalive_connections=max(0, int(os.getenv("DEEPGRAM_POOL_MAX_KEEPALIVE", "20"))),
+    keepalive_expiry=float(os.getenv("DEEPGRAM_POOL_KEEPALIVE_EXPIRY", "30")),
+)
+API_TOKEN = (os.getenv("API_TOKEN") or "").strip()
+# Compared against the token of every /api request.
+_API_TOKEN_BYTES = API_TOKEN.encode("utf-8")
+CALL_PROCESSOR_TIMEOUT_SECONDS = float(os.getenv("CALL_PROCESSOR_TIMEOUT_SECONDS", "600"))
+# Threadpool size for blocking work (DB calls, TTS SDK, ffmpeg). Call processing
+# runs in its own process pool and does not hold these threads.
+THREADPOOL_TOKENS = max(1, int(os.getenv("THREADPOOL_TOKENS", "64")))
+# Long-lived worker processes running call_processor (AI enrichment, embeddings).
+CALL_PROCESSOR_WORKERS = max(1, int(os.getenv("CALL_PROCESSOR_WORKERS", "2")))
+# Transcripts at least this long are handed to the workers through shared
+# memory instead of being pickled through the pool's pipe.
+_SHARED_TRANSCRIPT_MIN_CHARS = 64 * 1024
+# Largest request body accepted by the API; bigger uploads get 413 (0 disables the limit).
+MAX_UPLOAD_BYTES = max(0, int(os.getenv("MAX_UPLOAD_BYTES", str(500 * 1024 * 1024))))
+# Deepgram TTS can handle 2000 characters per request https://developers.deepgram.com/docs/text-to-speech#input-text-limit
+TTS_CHUNK_SIZE = 2000
+# Preferred cut points for TTS chunks, highest priority first.
+_TTS_SEPARATORS = ("\n\n", "\n", ".", "?", "!", " ")
+# Maximum number of /get_speech and /get_transcription requests talking to
+# Deepgram at once; further requests are rejected with 503 instead of queueing.
+DEEPGRAM_MAX_INFLIGHT = max(1, int(os.getenv("DEEPGRAM_MAX_INFLIGHT", "16")))
+_DEEPGRAM_INFLIGHT = asyncio.Semaphore(DEEPGRAM_MAX_INFLIGHT)
+# Multichannel speaker labels in Deepgram paragraph transcripts.
+_CHANNEL_LABEL_RE = re.compile(r"Channel ([01]):")
+# Persisted transcriptions currently running, by uniqueid and output-affecting inputs.
+_INFLIGHT_TRANSCRIPTIONS: dict[tuple, asyncio.Future] = {}
+# Enrichments started for transcriptions whose client went away (referenced until done).
+_ENRICHMENT_TASKS: set[asyncio.Future] = set()
+# Maximum number of TTS chunks synthesized concurrently per /get_speech request.
+DEEPGRAM_TTS_CONCURRENCY = max(1, int(os.getenv("DEEPGRAM_TTS_CONCURRENCY", "4")))
 
 DEEPGRAM_TTS_MODELS = [
     "aura-2-agathe-fr",
@@ -129,75 +187,356 @@ DEEPGRAM_TTS_MODELS = [
     "aura-zeus-en",
 ]
 
-def _iter_bytes(data: bytes, *, chunk_size: int):
-    for i in range(0, len(data), chunk_size):
-        yield data[i : i + chunk_size]
 
+def _group_models_by_language(models: list[str]) -> dict[str, tuple[str, ...]]:
+    grouped: dict[str, list[str]] = {}
+    for model in models:
+        grouped.setdefault(model.rsplit("-", 1)[-1].lower(), []).append(model)
+    return {language: tuple(names) for language, names in grouped.items()}
+
+
+# Built once at import so get_models is a dict lookup.
+_ALL_MODELS = tuple(DEEPGRAM_TTS_MODELS)
+_MODELS_BY_LANG = _group_models_by_language(DEEPGRAM_TTS_MODELS)
+
+# Valid Deepgram REST API parameters for /v1/listen endpoint
+_DEEPGRAM_LISTEN_PARAMS = {
+    "callback": "",
+    "callback_method": "",
+    "custom_topic": "",
+    "custom_topic_mode": "",
+    "custom_intent": "",
+    "custom_intent_mode": "",
+    "detect_entities": "",
+    "detect_language": "true",
+    "diarize": "",
+    "dictation": "",
+    "encoding": "",
+    "extra": "",
+    "filler_words": "",
+    "intents": "",
+    "keyterm": "",
+    "keywords": "",
+    "language": "",
+    "measurements": "",
+    "mip_opt_out": "", # Opts out requests from the Deepgram Model Improvement Program
+    "model": "nova-3",
+    "multichannel": "",
+    "numerals": "true",
+    "paragraphs": "true",
+    "profanity_filter": "",
+    "punctuate": "true",
+    "redact": "",
+    "replace": "",
+    "search": "",
+    "sentiment": "false",
+    "smart_format": "true",
+    "summarize": "",
+    "tag": "",
+    "topics": "",
+    "utterances": "",
+    "utt_split": "",
+    "version": "",
+}
+# Non-empty defaults sent on every request, and the keys callers may override.
+_DEEPGRAM_LISTEN_DEFAULTS = {k: v for k, v in _DEEPGRAM_LISTEN_PARAMS.items() if v}
+_DEEPGRAM_LISTEN_KEYS = frozenset(_DEEPGRAM_LISTEN_PARAMS)
+# Accepted spellings of an enabled boolean request flag.
+_TRUE_VALUES = frozenset({"1", "true", "yes"})
+
+
+def _split_for_tts(text: str, limit: int = TTS_CHUNK_SIZE) -> list[str]:
+    """Split text into stripped chunks of at most limit characters for Deepgram TTS."""
+    return ai._split_text(text, limit, _TTS_SEPARATORS)
+
+
+@asynccontextmanager
+async def _deepgram_slot():
+    """Hold one of the DEEPGRAM_MAX_INFLIGHT slots, failing fast with 503 when all are taken."""
+    if _DEEPGRAM_INFLIGHT.locked():
+        logger.warning("Too many in-flight Deepgram requests (max=%s); rejecting", DEEPGRAM_MAX_INFLIGHT)
+        raise HTTPException(status_code=503, detail="Busy", headers={"Retry-After": "1"})
+    async with _DEEPGRAM_INFLIGHT:
+        yield
+
+
+def _has_audio_header(head: bytes, content_type: str | None) -> bool:
+    if content_type in ("audio/wav", "audio/x-wav"):
+        return head[:4] == b"RIFF" and head[8:12] == b"WAVE"
+    # MP3: an ID3v2 tag or an MPEG frame sync.
+    return head[:3] == b"ID3" or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0)
+
+
+async def _request_params(request: Request) -> ChainMap:
+    """Return the text form fields layered over query parameters.
+
+    Uploaded parts (the "file" field or any other) are left out: callers treat
+    every parameter as a string.
+    """
+    try:
+        form = await request.form()
+    except MultiPartException:
+        form = FormData()
+    fields = {k: v for k, v in form.multi_items() if isinstance(v, str)}
+    # The leading dict takes writes; QueryParams is immutable.
+    if not fields:
+        # Upload with all metadata in the query string: skip the form layer on every lookup.
+        return ChainMap({}, request.query_params)
+    return ChainMap({}, fields, request.query_params)
+
+
+def _extract_transcript(result: dict) -> tuple[str | None, str | None]:
+    """Return the paragraphs transcript and detected language from a Deepgram result."""
+    results = result.get("results") or {}
+    channel0 = (results.get("channels") or [{}])[0]
+    transcript = (results.get("paragraphs") or {}).get("transcript")
+    if transcript is None:
+        alternative0 = (channel0.get("alternatives") or [{}])[0]
+        transcript = (alternative0.get("paragraphs") or {}).get("transcript")
+    return transcript, channel0.get("detected_language")
+
+
+async def _mark_failed(transcript_id: int | None) -> None:
+    """Mark a persisted transcript as failed; errors are logged, not raised."""
+    if transcript_id is None:
+        return
+    try:
+        await db.aset_transcript_state(transcript_id=transcript_id, state="failed")
+    except Exception:
+        logger.exception("Failed to update transcript state=failed")
+
+
+def _take_upload(upload: UploadFile) -> UploadFile:
+    """Move the upload's spooled file into a new UploadFile the caller must close.
+
+    FastAPI closes a request's uploads when the request ends. A transcription shared
+    with other requests may still be streaming the file then, so it takes the file
+    over (no copy) and leaves an empty placeholder to be closed instead.
+    """
+    owned = UploadFile(upload.file, size=upload.size, filename=upload.filename, headers=upload.headers)
+    upload.file = io.BytesIO()
+    return owned
+
+
+async def _iter_upload(upload: UploadFile, bufsize: int = 1 << 16):
+    """Yield an uploaded file in bufsize pieces so it can be streamed to Deepgram."""
+    while chunk := await upload.read(bufsize):
+        yield chunk
+
+
+def _new_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=DEEPGRAM_TIMEOUT,
+        limits=DEEPGRAM_POOL_LIMITS,
+        # HTTP/2 needs the optional h2 package; fall back to HTTP/1.1 keep-alive without it.
+        http2=importlib.util.find_spec("h2") is not None,
+    )
+
+
+def _http_client(app: FastAPI) -> httpx.AsyncClient:
+    """Return the shared Deepgram HTTP client, keeping connections alive across requests."""
+    client = getattr(app.state, "http", None)
+    if client is None:
+        # Lifespan did not run (e.g. app used without startup); create it on first use.
+        client = app.state.http = _new_http_client()
+    return client
+
+
+async def _warm_up_deepgram(client: httpx.AsyncClient) -> None:
+    """Open a keep-alive connection to Deepgram so the first request skips the TLS handshake."""
+    if not DEEPGRAM_API_KEY:
+        return
+    try:
+        await client.get(
+            "https://api.deepgram.com/v1/projects",
+            headers={"Authorization": _DEEPGRAM_AUTHORIZATION},
+        )
+    except httpx.HTTPError as e:
+        logger.debug("Deepgram warm-up failed: %s", e)
+
+
+def _init_call_processor_worker() -> None:
+    # Pay the heavy AI/DB imports once per worker instead of once per call.
+    import call_processor
+
+    call_processor.configure_logging()
+
+
+def _process_call(transcript_id: int, raw_transcription: str, summary: bool, deadline: float) -> None:
+    import call_processor
+
+    # The worker marks the transcript done itself, together with its last write.
+    call_processor.process(transcript_id, raw_transcription, summary, final_state="done", deadline=deadline)
+
+
+def _process_shared_call(transcript_id: int, shm_name: str, length: int, summary: bool, deadline: float) -> None:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        raw_transcription = str(shm.buf[:length], "utf-8")
+    finally:
+        shm.close()
+    _process_call(transcript_id, raw_transcription, summary, deadline)
+
+
+def _call_processor_ready() -> None:
+    """No-op job used to start a worker (and run its initializer) ahead of the first call."""
+
+
+def _new_call_pool() -> ProcessPoolExecutor:
+    # spawn: forking the threaded API process could copy held locks into the workers.
+    return ProcessPoolExecutor(
+        max_workers=CALL_PROCESSOR_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_call_processor_worker,
+    )
+
+
+def _call_pool(app: FastAPI) -> ProcessPoolExecutor:
+    """Return the call processor worker pool, creating it on first use."""
+    pool = getattr(app.state, "call_pool", None)
+    if pool is None:
+        pool = app.state.call_pool = _new_call_pool()
+    return pool
+
+
+def _recycle_call_pool(app: FastAPI, pool: ProcessPoolExecutor) -> None:
+    """Replace a pool holding a job stuck past its deadline and kill its workers.
+
+    A worker cannot be interrupted inside a blocking DB write or embedding call,
+    and ProcessPoolExecutor cannot stop a single worker, so the whole pool goes:
+    other jobs still running on it fail and their transcripts are marked failed.
+    """
+    if getattr(app.state, "call_pool", None) is pool:
+        app.state.call_pool = _new_call_pool()
+    terminate_workers = getattr(pool, "terminate_workers", None)
+    if terminate_workers is not None:
+        # Python 3.14+
+        terminate_workers()
+        return
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_TOKENS
+    app.state.http = _new_http_client()
+    warm_up = asyncio.create_task(_warm_up_deepgram(app.state.http))
+    if db.is_configured():
+        await db.aopen_pool()
+    app.state.call_pool = _new_call_pool()
+    if OPENAI_ENABLED:
+        # Start every worker now so the first enriched calls don't pay for
+        # interpreter startup and the AI/DB imports.
+        for _ in range(CALL_PROCESSOR_WORKERS):
+            app.state.call_pool.submit(_call_processor_ready)
+    try:
+        yield
+    finally:
+        warm_up.cancel()
+        await app.state.http.aclose()
+        await db.aclose_pool()
+        app.state.call_pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _UploadLimitMiddleware:
+    """Reject request bodies over MAX_UPLOAD_BYTES before they are parsed or spooled."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limit = MAX_UPLOAD_BYTES
+        if scope["type"] != "http" or not limit:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": "Upload too large"}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        # Chunked uploads carry no Content-Length: count bytes as they arrive.
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail="Upload too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+app = FastAPI(lifespan=_lifespan)
+app.add_middleware(_UploadLimitMiddleware)
 
-def _concat_and_boost_mp3_ffmpeg_sync(chunks: list[bytes], gain: float) -> bytes:
+
+def _write_concat_inputs(temp_dir: str, chunks: list[bytes]) -> None:
+    with open(os.path.join(temp_dir, "inputs.txt"), "w", encoding="utf-8") as concat_file:
+        for index, chunk in enumerate(chunks, start=1):
+            chunk_filename = f"chunk_{index:04d}.mp3"
+            with open(os.path.join(temp_dir, chunk_filename), "wb") as chunk_file:
+                chunk_file.write(chunk)
+            concat_file.write(f"file '{chunk_filename}'\n")
+
+
+async def _concat_and_boost_mp3_ffmpeg(chunks: list[bytes], gain: float = 8.0) -> bytes:
     ffmpeg_path = shutil.which("ffmpeg")
     if not ffmpeg_path:
         raise RuntimeError("ffmpeg is not installed or not available in PATH")
 
     with tempfile.TemporaryDirectory(prefix="satellite-tts-", delete=False) as temp_dir:
-        concat_file_path = os.path.join(temp_dir, "inputs.txt")
-        output_path = os.path.join(temp_dir, "output.mp3")
-
-        with open(concat_file_path, "w", encoding="utf-8") as concat_file:
-            for index, chunk in enumerate(chunks, start=1):
-                chunk_filename = f"chunk_{index:04d}.mp3"
-                chunk_path = os.path.join(temp_dir, chunk_filename)
-                with open(chunk_path, "wb") as chunk_file:
-                    chunk_file.write(chunk)
-                concat_file.write(f"file '{chunk_filename}'\n")
-
-        proc = subprocess.run(
-            [
-                ffmpeg_path,
-                "-hide_banner",
-                "-loglevel",
-                "error",
-                "-f",
-                "concat",
-                "-safe",
-                "0",
-                "-i",
-                "inputs.txt",
-                "-filter:a",
-                f"volume={gain}",
-                "-y",
-                "output.mp3",
-            ],
+        await run_in_threadpool(_write_concat_inputs, temp_dir, chunks)
+
+        # Awaited on the event loop: no threadpool thread is held while ffmpeg runs.
+        proc = await asyncio.create_subprocess_exec(
+            ffmpeg_path,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            "inputs.txt",
+            "-filter:a",
+            f"volume={gain}",
+            "-f",
+            "mp3",
+            "pipe:1",
             cwd=temp_dir,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=False,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
         )
+        audio, stderr = await proc.communicate()
 
         if proc.returncode != 0:
-            stderr_preview = (proc.stderr or b"")[:2000].decode("utf-8", errors="replace")
+            stderr_preview = (stderr or b"")[:2000].decode("utf-8", errors="replace")
             raise RuntimeError(f"ffmpeg failed rc={proc.returncode} stderr={stderr_preview!r}")
 
-        with open(output_path, "rb") as output_file:
-            return output_file.read()
-
-
-async def _concat_and_boost_mp3_ffmpeg(chunks: list[bytes], gain: float = 8.0) -> bytes:
-    return await run_in_threadpool(_concat_and_boost_mp3_ffmpeg_sync, chunks, gain)
+        return audio
 
 
 def _tts_chunk_to_bytes_sync(text: str, options: SpeakOptions) -> bytes:
     """Synthesize a single text chunk via Deepgram SDK and return audio bytes."""
     deepgram = DeepgramClient(DEEPGRAM_API_KEY)
-    timeout = httpx.Timeout(connect=10.0, read=300.0, write=300.0, pool=10.0)
     response = deepgram.speak.rest.v("1").stream_memory(
-        {"text": text}, options, timeout=timeout
+        {"text": text}, options, timeout=DEEPGRAM_TIMEOUT
     )
     return response.stream_memory.read()
 
 
-def _require_api_token_if_configured(request: Request) -> None:
-    configured_token = (os.getenv("API_TOKEN") or "").strip()
+# async: FastAPI runs sync dependencies in the threadpool, one hop per request.
+async def _require_api_token_if_configured(request: Request) -> None:
+    configured_token = _API_TOKEN_BYTES
     if not configured_token:
         return
 
@@ -210,7 +549,7 @@ def _require_api_token_if_configured(request: Request) -> None:
     if not provided_token:
         provided_token = (request.headers.get("x-api-token") or "").strip() or None
 
-    if not provided_token or provided_token != configured_token:
+    if not provided_token or not hmac.compare_digest(provided_token.encode("utf-8"), configured_token):
         raise HTTPException(
             status_code=401,
             detail="Unauthorized",
@@ -218,73 +557,92 @@ def _require_api_token_if_configured(request: Request) -> None:
         )
 
 
+# Response models: FastAPI serializes these straight to JSON bytes with
+# pydantic-core instead of going through jsonable_encoder and json.dumps.
+class ModelsResponse(BaseModel):
+    models: tuple[str, ...]
+
+
+class TranscriptionResponse(BaseModel):
+    transcript: str
+    detected_language: str | None = None
+
+
 api_router = APIRouter(
     prefix="/api",
     dependencies=[Depends(_require_api_token_if_configured)],
 )
 
-def _run_call_processor(
+async def _run_call_processor(
+    app: FastAPI,
     *,
     transcript_id: int,
     raw_transcription: str,
     summary: bool = False,
 ) -> None:
-    payload = {"transcript_id": transcript_id, "raw_transcription": raw_transcription, "summary": summary}
-    proc = subprocess.run(
-        [sys.executable, os.path.join(os.path.dirname(__file__), "call_processor.py")],
-        input=json.dumps(payload).encode("utf-8"),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        timeout=float(os.getenv("CALL_PROCESSOR_TIMEOUT_SECONDS", "600")),
-    )
+    pool = _call_pool(app)
+    # The worker's deadline counts from submission, so time spent queued is included.
+    deadline = time.time() + CALL_PROCESSOR_TIMEOUT_SECONDS
+    if len(raw_transcription) < _SHARED_TRANSCRIPT_MIN_CHARS:
+        future = pool.submit(_process_call, transcript_id, raw_transcription, summary, deadline)
+    else:
+        data = raw_transcription.encode("utf-8")
+        shm = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            shm.buf[: len(data)] = data
+            future = pool.submit(_process_shared_call, transcript_id, shm.name, len(data), summary, deadline)
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        shm.close()
+        # The worker may still be reading after a timeout; unlink once the job is finished.
+        future.add_done_callback(lambda _: shm.unlink())
+    try:
+        await asyncio.wait_for(asyncio.wrap_future(future), timeout=CALL_PROCESSOR_TIMEOUT_SECONDS)
+    except TimeoutError:
+        # The timeout cancels a queued job; one already running is holding a worker.
+        if future.running():
+            logger.warning("Call processing for transcript_id=%s timed out; recycling the worker pool", transcript_id)
+            _recycle_call_pool(app, pool)
+        raise
 
-    # The subprocess logs (including ai pipeline logs) go to stderr by default.
-    # Since we're capturing stderr, re-log it here so it shows up in the API logs
-    # even when the subprocess succeeds.
-    stderr_text = (proc.stderr or b"").decode("utf-8", errors="replace")
-    if stderr_text.strip():
-        lines = stderr_text.splitlines()
-        max_lines = int(os.getenv("CALL_PROCESSOR_LOG_MAX_LINES", "200"))
-        if len(lines) > max_lines:
-            lines = lines[:max_lines] + [f"... (truncated; {len(stderr_text)} bytes total)"]
-        for line in lines:
-            if line.strip():
-                logger.info("call_processor[%s]: %s", transcript_id, line)
-
-    if proc.returncode != 0:
-        stderr_preview = (proc.stderr or b"")[:2000].decode("utf-8", errors="replace")
-        stdout_preview = (proc.stdout or b"")[:2000].decode("utf-8", errors="replace")
-        raise RuntimeError(f"call_processor failed rc={proc.returncode} stdout={stdout_preview!r} stderr={stderr_preview!r}")
-
-
-def get_models(language: str | None = None) -> list[str]:
-    models = DEEPGRAM_TTS_MODELS
+
+async def _enrich_transcript(
+    app: FastAPI,
+    *,
+    transcript_id: int,
+    raw_transcription: str,
+    summary: bool,
+) -> None:
+    try:
+        await _run_call_processor(
+            app,
+            transcript_id=transcript_id,
+            raw_transcription=raw_transcription,
+            summary=summary,
+        )
+    except Exception:
+        logger.exception("Failed to process call transcript")
+        await _mark_failed(transcript_id)
+
+
+def get_models(language: str | None = None) -> tuple[str, ...]:
     normalized_language = (language or "").strip().lower()
     if not normalized_language:
-        return models
-    language_suffix = f"-{normalized_language}"
-    return [model for model in models if model.lower().endswith(language_suffix)]
+        return _ALL_MODELS
+    return _MODELS_BY_LANG.get(normalized_language, ())
 
 
 @api_router.get("/get_models")
-async def get_models_endpoint(language: str | None = None):
-    return {"models": get_models(language)}
+async def get_models_endpoint(language: str | None = None) -> ModelsResponse:
+    return ModelsResponse(models=get_models(language))
 
 
 @api_router.post("/get_speech")
 async def get_speech(request: Request):
     # Collect parameters from query string and multipart/x-www-form-urlencoded form fields
-    try:
-        form = await request.form()
-    except Exception:
-        form = {}
-
-    form_params = {}
-    if hasattr(form, "items"):
-        for k, v in form.items():
-            form_params[k] = v if isinstance(v, str) else str(v)
-
-    input_params = {**dict(request.query_params), **form_params}
+    input_params = await _request_params(request)
     logger.debug("Params: %s", input_params)
 
     text = (input_params.get("text") or input_params.get("input") or "").strip()
@@ -300,14 +658,7 @@ async def get_speech(request: Request):
     if container and container != "mp3":
         raise HTTPException(status_code=400, detail="Only MP3 output is supported")
 
-    # use langchain text splitter to split text into smaller chunks
-    # Deepgram TTS can handle 2000 characters per request https://developers.deepgram.com/docs/text-to-speech#input-text-limit
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=2000,
-        chunk_overlap=0,
-        separators=["\n\n", "\n", ".", "?", "!", " ", ""],
-    )
-    chunks = [c.strip() for c in splitter.split_text(text or "")]
+    chunks = _split_for_tts(text)
     if not chunks:
         raise HTTPException(status_code=400, detail="Text is empty")
 
@@ -330,33 +681,47 @@ async def get_speech(request: Request):
     options = SpeakOptions(**speak_kwargs)
     logger.debug("Deepgram TTS options: %s", speak_kwargs)
 
-    audio_parts: list[bytes] = []
-    try:
-        for idx, chunk in enumerate(chunks, start=1):
+    semaphore = asyncio.Semaphore(DEEPGRAM_TTS_CONCURRENCY)
+
+    async def _synthesize(idx: int, chunk: str) -> bytes:
+        async with semaphore:
             audio_data = await run_in_threadpool(
                 _tts_chunk_to_bytes_sync, chunk, options
             )
-            logger.debug(
-                "Deepgram TTS response: chunk=%s/%s bytes=%s",
-                idx, len(chunks), len(audio_data),
-            )
-            audio_parts.append(audio_data)
-    except DeepgramApiError as e:
-        status = int(e.status) if e.status else 502
-        logger.error("Deepgram TTS API error: status=%s message=%s", e.status, e.message)
-        raise HTTPException(
-            status_code=status,
-            detail=f"Deepgram API error: {e.message}",
+        logger.debug(
+            "Deepgram TTS response: chunk=%s/%s bytes=%s",
+            idx, len(chunks), len(audio_data),
         )
-    except httpx.TimeoutException:
-        logger.warning("Deepgram TTS request timed out")
-        raise HTTPException(status_code=504, detail="Deepgram request timed out")
-    except httpx.RequestError as e:
-        logger.error("Deepgram TTS request failed: %s", str(e))
-        raise HTTPException(status_code=502, detail="Failed to reach Deepgram")
-    except Exception as e:
-        logger.exception("Unexpected error while calling Deepgram TTS")
-        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+        return audio_data
+
+    async with _deepgram_slot():
+        try:
+            # Chunks are synthesized concurrently; gather keeps them in text order.
+            results = await asyncio.gather(
+                *(_synthesize(idx, chunk) for idx, chunk in enumerate(chunks, start=1)),
+                return_exceptions=True,
+            )
+            audio_parts: list[bytes] = []
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+                audio_parts.append(result)
+        except DeepgramApiError as e:
+            status = int(e.status) if e.status else 502
+            logger.error("Deepgram TTS API error: status=%s message=%s", e.status, e.message)
+            raise HTTPException(
+                status_code=status,
+                detail=f"Deepgram API error: {e.message}",
+            )
+        except httpx.TimeoutException:
+            logger.warning("Deepgram TTS request timed out")
+            raise HTTPException(status_code=504, detail="Deepgram request timed out")
+        except httpx.RequestError as e:
+            logger.error("Deepgram TTS request failed: %s", str(e))
+            raise HTTPException(status_code=502, detail="Failed to reach Deepgram")
+        except Exception as e:
+            logger.exception("Unexpected error while calling Deepgram TTS")
+            raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
     try:
         audio_bytes = await _concat_and_boost_mp3_ffmpeg(audio_parts, gain=8.0)
@@ -373,8 +738,10 @@ async def get_speech(request: Request):
         "Cache-Control": "no-store",
         "X-Content-Type-Options": "nosniff",
     }
-    return StreamingResponse(
-        _iter_bytes(audio_bytes, chunk_size=65536),
+    # The boosted MP3 is already fully in memory: send it in one body instead
+    # of re-chunking it through a sync iterator run in the threadpool.
+    return Response(
+        content=audio_bytes,
         media_type="audio/mpeg",
         headers=headers_out,
     )
@@ -382,232 +749,226 @@ async def get_speech(request: Request):
 @api_router.post('/get_transcription')
 async def get_transcription(
     request: Request,
+    background: BackgroundTasks,
     file: UploadFile = File(...)
-):
+) -> TranscriptionResponse:
     if file.content_type not in ("audio/wav", "audio/x-wav", "audio/mpeg", "audio/mp3"):
         logger.warning("Unsupported file type: %s", file.content_type)
         raise HTTPException(status_code=400, detail="Invalid file type. Only WAV files are supported.")
 
-    audio_bytes = await file.read()
-
-    # Collect parameters from query string and multipart form fields (excluding the file)
-    try:
-        form = await request.form()
-    except Exception:
-        form = {}
-
-    form_params = {}
-    if hasattr(form, "items"):
-        for k, v in form.items():
-            if k == "file":
-                continue
-            form_params[k] = v if isinstance(v, str) else str(v)
-
-    input_params = {**dict(request.query_params), **form_params}
-
-    logger.debug(f"Params: {input_params}")
+    # Collect parameters from query string and multipart form fields
+    input_params = await _request_params(request)
+    logger.debug("Params: %s", input_params)
 
     uniqueid = (input_params.get("uniqueid") or "").strip()
     channel0_name = (input_params.get("channel0_name") or "").strip()
     channel1_name = (input_params.get("channel1_name") or "").strip()
     # Persist only when explicitly requested.
-    persist = (input_params.get("persist") or "false").lower() in ("1", "true", "yes")
-    summary = (input_params.get("summary") or "false").lower() in ("1", "true", "yes")
+    persist = (input_params.get("persist") or "").lower() in _TRUE_VALUES
+    summary = (input_params.get("summary") or "").lower() in _TRUE_VALUES
 
-    # uniqueid is only required when persistence is enabled.
+    # uniqueid is only required when persistence is enabled. Checked before touching
+    # the upload: rejecting on the parameters alone never reads the spooled file.
     if persist:
         try:
             db.validate_uniqueid(uniqueid)
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
 
+    # Check the magic bytes before anything is persisted or sent to Deepgram.
+    head = await file.read(12)
+    if not _has_audio_header(head, file.content_type):
+        logger.warning("Uploaded file does not match its content type: %s", file.content_type)
+        raise HTTPException(status_code=400, detail="Invalid file content. The upload is not a valid WAV or MP3 file.")
+    await file.seek(0)
+
+    # Only look at the parameters the client sent, usually a handful, and strip each once.
+    overrides = {
+        k: v
+        for k in _DEEPGRAM_LISTEN_KEYS.intersection(input_params)
+        if (v := (input_params[k] or "").strip())
+    }
+    params = {**_DEEPGRAM_LISTEN_DEFAULTS, **overrides}
+
+    key = None
+    if persist:
+        # A client retrying the same call while the first upload is still being
+        # transcribed joins that upload instead of paying for a second Deepgram call.
+        # Only uploads that would produce the same result join: same call, same
+        # upload size and type, and the same output-affecting parameters.
+        key = (
+            uniqueid,
+            file.content_type,
+            file.size,
+            channel0_name,
+            channel1_name,
+            summary,
+            tuple(sorted(params.items())),
+        )
+        pending = _INFLIGHT_TRANSCRIPTIONS.get(key)
+        if pending is not None:
+            logger.info("Joining in-flight transcription of uniqueid=%s", uniqueid)
+            # Shielded: a joiner going away must not cancel the original request.
+            response, _ = await asyncio.shield(pending)
+            return response
+
+    if key is not None:
+        # The shared task may outlive this request, which closes its upload on exit.
+        file = _take_upload(file)
+    transcribe = _transcribe(
+        request.app,
+        file,
+        params,
+        uniqueid=uniqueid,
+        channel0_name=channel0_name,
+        channel1_name=channel1_name,
+        persist=persist,
+        summary=summary,
+    )
+    if key is None:
+        response, enrichment = await transcribe
+    else:
+        pending = _INFLIGHT_TRANSCRIPTIONS[key] = asyncio.ensure_future(transcribe)
+        pending.add_done_callback(lambda _: _INFLIGHT_TRANSCRIPTIONS.pop(key, None))
+        pending.add_done_callback(lambda _: file.file.close())
+        try:
+            # Shielded too: if this client goes away, the joiners still get the transcript.
+            response, enrichment = await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            # No response will be sent, so no background task runs: start the
+            # enrichment from the shared task once the transcript is stored.
+            pending.add_done_callback(partial(_enrich_abandoned, request.app))
+            raise
+
+    if enrichment is not None:
+        # Runs after the response is sent; clients follow transcripts.state.
+        background.add_task(_enrich_transcript, request.app, **enrichment)
+    return response
+
+
+def _enrich_abandoned(app: FastAPI, task: asyncio.Future) -> None:
+    if task.cancelled() or task.exception() is not None:
+        return
+    _, enrichment = task.result()
+    if enrichment is not None:
+        job = asyncio.ensure_future(_enrich_transcript(app, **enrichment))
+        _ENRICHMENT_TASKS.add(job)
+        job.add_done_callback(_ENRICHMENT_TASKS.discard)
+
+
+async def _transcribe(
+    app: FastAPI,
+    file: UploadFile,
+    params: dict,
+    *,
+    uniqueid: str,
+    channel0_name: str,
+    channel1_name: str,
+    persist: bool,
+    summary: bool,
+) -> tuple[TranscriptionResponse, dict | None]:
+    """Transcribe and persist an upload; return the response and the enrichment job, if any."""
+
     transcript_id = None
     if db.is_configured() and persist:
         # Create/mark a DB row immediately so we can track state even if Deepgram fails.
         try:
-            transcript_id = await run_in_threadpool(
-                db.upsert_transcript_progress,
-                uniqueid=uniqueid,
-            )
+            transcript_id = await db.aupsert_transcript_progress(uniqueid=uniqueid)
         except Exception:
             logger.exception("Failed to initialize transcript row for state tracking")
             raise HTTPException(status_code=500, detail="Failed to initialize transcript persistence")
 
-    # Valid Deepgram REST API parameters for /v1/listen endpoint
-    deepgram_params = {
-        "callback": "",
-        "callback_method": "",
-        "custom_topic": "",
-        "custom_topic_mode": "",
-        "custom_intent": "",
-        "custom_intent_mode": "",
-        "detect_entities": "",
-        "detect_language": "true",
-        "diarize": "",
-        "dictation": "",
-        "encoding": "",
-        "extra": "",
-        "filler_words": "",
-        "intents": "",
-        "keyterm": "",
-        "keywords": "",
-        "language": "",
-        "measurements": "",
-        "mip_opt_out": "", # Opts out requests from the Deepgram Model Improvement Program
-        "model": "nova-3",
-        "multichannel": "",
-        "numerals": "true",
-        "paragraphs": "true",
-        "profanity_filter": "",
-        "punctuate": "true",
-        "redact": "",
-        "replace": "",
-        "search": "",
-        "sentiment": "false",
-        "smart_format": "true",
-        "summarize": "",
-        "tag": "",
-        "topics": "",
-        "utterances": "",
-        "utt_split": "",
-        "version": "",
-    }
-
     headers = {
-        "Authorization": f"Token {DEEPGRAM_API_KEY}",
+        "Authorization": _DEEPGRAM_AUTHORIZATION,
         "Content-Type": file.content_type
     }
-
-    params = {}
-    for k, v in deepgram_params.items():
-        if k in input_params and input_params[k].strip():
-            params[k] = input_params[k]
-        elif v.strip():
-            params[k] = v
+    if file.size is not None:
+        # Known upload size: send Content-Length instead of a chunked body.
+        headers["Content-Length"] = str(file.size)
 
     try:
-        deepgram_timeout_seconds = 300.0
-        timeout = httpx.Timeout(
-            connect=10.0,
-            read=deepgram_timeout_seconds,
-            write=deepgram_timeout_seconds,
-            pool=10.0,
-        )
-        async with httpx.AsyncClient(timeout=timeout) as client:
+        async with _deepgram_slot():
+            client = _http_client(app)
             response = await client.post(
                 "https://api.deepgram.com/v1/listen",
                 headers=headers,
                 params=params,
-                content=audio_bytes,
+                # Streamed from the spooled upload rather than read into memory first.
+                content=_iter_upload(file),
             )
-            # Debug: log response meta and preview
-            try:
-                logger.debug(
-                    "Deepgram response: status=%s content_type=%s body_preview=%s",
-                    response.status_code,
-                    response.headers.get("Content-Type"),
-                    (response.text[:500] if response is not None and hasattr(response, "text") and response.text else ""),
-                )
-            except Exception:
-                logger.debug("Failed to log Deepgram response preview")
+            # Debug: log response meta and preview. Guarded because building the
+            # preview touches the (possibly multi-MB) body.
+            if logger.isEnabledFor(logging.DEBUG):
+                try:
+                    logger.debug(
+                        "Deepgram response: status=%s content_type=%s body_preview=%s",
+                        response.status_code,
+                        response.headers.get("Content-Type"),
+                        response.content[:500].decode("utf-8", "replace"),
+                    )
+                except Exception:
+                    logger.debug("Failed to log Deepgram response preview")
             response.raise_for_status()
+    except HTTPException:
+        # Rejected by _deepgram_slot: too many in-flight Deepgram requests.
+        await _mark_failed(transcript_id)
+        raise
     except httpx.HTTPStatusError as e:
-        if transcript_id is not None:
-            try:
-                await run_in_threadpool(db.set_transcript_state, transcript_id=transcript_id, state="failed")
-            except Exception:
-                logger.exception("Failed to update transcript state=failed")
-        try:
-            status = e.response.status_code if e.response is not None else "unknown"
-            body_preview = e.response.text[:500] if e.response is not None and hasattr(e.response, "text") and e.response.text else ""
-            logger.error("Deepgram API error: status=%s body_preview=%s", status, body_preview)
-        except Exception:
-            logger.error("Deepgram API error (logging failed)")
-        raise HTTPException(status_code=e.response.status_code, detail=f"Deepgram API error: {e.response.text}")
+        await _mark_failed(transcript_id)
+        # HTTPStatusError always carries the response; decode its body once.
+        error_text = e.response.text
+        logger.error("Deepgram API error: status=%s body_preview=%.500s", e.response.status_code, error_text)
+        raise HTTPException(status_code=e.response.status_code, detail=f"Deepgram API error: {error_text}")
     except httpx.TimeoutException:
         logger.warning("Deepgram request timed out (uniqueid=%s)", uniqueid)
-        if transcript_id is not None:
-            try:
-                await run_in_threadpool(db.set_transcript_state, transcript_id=transcript_id, state="failed")
-            except Exception:
-                logger.exception("Failed to update transcript state=failed")
+        await _mark_failed(transcript_id)
         raise HTTPException(status_code=504, detail="Deepgram request timed out")
     except httpx.RequestError as e:
         logger.error("Deepgram request failed (uniqueid=%s): %s", uniqueid, str(e))
-        if transcript_id is not None:
-            try:
-                await run_in_threadpool(db.set_transcript_state, transcript_id=transcript_id, state="failed")
-            except Exception:
-                logger.exception("Failed to update transcript state=failed")
+        await _mark_failed(transcript_id)
         raise HTTPException(status_code=502, detail="Failed to reach Deepgram")
     except Exception as e:
         logger.exception("Unexpected error while calling Deepgram")
-        if transcript_id is not None:
-            try:
-                await run_in_threadpool(db.set_transcript_state, transcript_id=transcript_id, state="failed")
-            except Exception:
-                logger.exception("Failed to update transcript state=failed")
+        await _mark_failed(transcript_id)
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
-    result = response.json()
-    detected_language = None  # always define; mocks may omit this field
-    try:
-        if "paragraphs" in result["results"] and "transcript" in result["results"]["paragraphs"]:
-            raw_transcription = result["results"]["paragraphs"]["transcript"].strip()
-        elif (
-            "channels" in result["results"]
-            and result["results"]["channels"]
-            and "alternatives" in result["results"]["channels"][0]
-            and result["results"]["channels"][0]["alternatives"]
-            and "paragraphs" in result["results"]["channels"][0]["alternatives"][0]
-            and "transcript" in result["results"]["channels"][0]["alternatives"][0]["paragraphs"]
-        ):
-            raw_transcription = (
-                result["results"]["channels"][0]["alternatives"][0]["paragraphs"]["transcript"].strip()
-            )
-        else:
-            logger.debug("failed to get paragraphs transcript")
-            logger.debug(result)
-            raise KeyError("paragraphs transcript not found")
-        if "channels" in result["results"] and "detected_language" in result["results"]["channels"][0]:
-            detected_language = result["results"]["channels"][0]["detected_language"]
-        else:
-            logger.debug("failed to get detected_language")
-            logger.debug(result)
-        if channel0_name:
-            raw_transcription = raw_transcription.replace("Channel 0:", f"{channel0_name}:")
-        if channel1_name:
-            raw_transcription = raw_transcription.replace("Channel 1:", f"{channel1_name}:")
-    except (KeyError, IndexError):
-        logger.error("Failed to parse Deepgram transcription response: %s", response.text)
-        if transcript_id is not None:
-            try:
-                await run_in_threadpool(db.set_transcript_state, transcript_id=transcript_id, state="failed")
-            except Exception:
-                logger.exception("Failed to update transcript state=failed")
+    # orjson parses the raw bytes directly, skipping a str decode of large transcripts.
+    result = orjson.loads(response.content)
+    transcript, detected_language = _extract_transcript(result)
+    if transcript is None:
+        logger.error(
+            "Failed to parse Deepgram transcription response: body_preview=%s",
+            response.content[:500].decode("utf-8", "replace"),
+        )
+        await _mark_failed(transcript_id)
         raise HTTPException(status_code=500, detail="Failed to parse transcription response.")
+    if detected_language is None:
+        logger.debug("failed to get detected_language")
+    raw_transcription = transcript.strip()
+    if channel0_name or channel1_name:
+        # Relabel both channels in a single pass over the transcript.
+        labels = {"0": f"{channel0_name or 'Channel 0'}:", "1": f"{channel1_name or 'Channel 1'}:"}
+        raw_transcription = _CHANNEL_LABEL_RE.sub(lambda m: labels[m.group(1)], raw_transcription)
+
+    # Optional AI enrichment (clean/summary/sentiment) runs after the raw transcript is stored.
+    enrich = OPENAI_ENABLED and transcript_id is not None and bool(raw_transcription)
 
     # Persist raw transcript when Postgres config is present (default) unless disabled per request.
     if transcript_id is not None:
         try:
-            transcript_id = await run_in_threadpool(
-                db.upsert_transcript_raw,
+            # The row moves to its next state in the same statement.
+            transcript_id = await db.aupsert_transcript_raw(
                 uniqueid=uniqueid,
                 raw_transcription=raw_transcription,
+                final_state="summarizing" if enrich else "done",
             )
         except ValueError as e:
             logger.exception("Invalid uniqueid for Postgres persistence")
-            try:
-                await run_in_threadpool(db.set_transcript_state, transcript_id=transcript_id, state="failed")
-            except Exception:
-                logger.exception("Failed to update transcript state=failed")
+            await _mark_failed(transcript_id)
             raise HTTPException(status_code=400, detail=str(e))
         except Exception:
             logger.exception("Failed to persist raw transcript to Postgres")
-            try:
-                await run_in_threadpool(db.set_transcript_state, transcript_id=transcript_id, state="failed")
-            except Exception:
-                logger.exception("Failed to update transcript state=failed")
+            await _mark_failed(transcript_id)
             raise HTTPException(status_code=500, detail="Failed to persist transcription")
     else:
         if not db.is_configured():
@@ -615,34 +976,10 @@ async def get_transcription(
         else:
             logger.debug("Postgres persistence disabled by request")
 
-    # Optional AI enrichment (clean/summary/sentiment) via per-request subprocess
-    did_enrichment = False
-    if os.getenv("OPENAI_API_KEY") and transcript_id is not None and raw_transcription:
-        try:
-            did_enrichment = True
-            await run_in_threadpool(db.set_transcript_state, transcript_id=transcript_id, state="summarizing")
-            await run_in_threadpool(
-                _run_call_processor,
-                transcript_id=transcript_id,
-                raw_transcription=raw_transcription,
-                summary=summary,
-            )
-            await run_in_threadpool(db.set_transcript_state, transcript_id=transcript_id, state="done")
-        except Exception:
-            logger.exception("Failed to process call transcript")
-            try:
-                await run_in_threadpool(db.set_transcript_state, transcript_id=transcript_id, state="failed")
-            except Exception:
-                logger.exception("Failed to update transcript state=failed")
-
-    # If we persisted but didn't run enrichment, the pipeline is complete after raw transcript is stored.
-    if transcript_id is not None and not did_enrichment:
-        try:
-            await run_in_threadpool(db.set_transcript_state, transcript_id=transcript_id, state="done")
-        except Exception:
-            logger.exception("Failed to update transcript state=done")
-
-    return {"transcript": raw_transcription, "detected_language": detected_language}
+    enrichment = None
+    if enrich:
+        enrichment = {"transcript_id": transcript_id, "raw_transcription": raw_transcription, "summary": summary}
+    return TranscriptionResponse(transcript=raw_transcription, detected_language=detected_language), enrichment
 
 
 app.include_router(api_router)
@@ -1,12 +1,71 @@
 import asyncio
 import logging
 import aiohttp
-import json
+import orjson
 import os
+import random
+import re
 from deepgram_connector import DeepgramConnector
 
 logger = logging.getLogger("asterisk_bridge")
 
+# Keep-alive pool for ARI REST requests. Call setup and teardown send bursts of
+# requests to the same Asterisk host; keep the connections around between calls.
+ARI_POOL_MAX_CONNECTIONS = max(1, int(os.getenv("ARI_POOL_MAX_CONNECTIONS", "64")))
+ARI_POOL_KEEPALIVE_EXPIRY = float(os.getenv("ARI_POOL_KEEPALIVE_EXPIRY", "75"))
+# ARI REST requests fail after this long instead of stalling call setup and teardown
+# when Asterisk stops answering. The event WebSocket is not affected.
+ARI_TIMEOUT_SECONDS = float(os.getenv("ARI_TIMEOUT_SECONDS", "10"))
+ARI_TIMEOUT = aiohttp.ClientTimeout(total=ARI_TIMEOUT_SECONDS, connect=min(3.0, ARI_TIMEOUT_SECONDS))
+
+# Event types handled by _handle_ari_event, as they appear quoted in the raw frame.
+# Every other ARI event (variable sets, DTMF, playbacks, ...) is dropped unparsed.
+_HANDLED_EVENT_RE = re.compile(r'"(?:StasisStart|StasisEnd|channelHangup|ChannelLeftBridge)"')
+# WebSocket message types that end the event loop
+_WS_END_TYPES = frozenset((aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR))
+
+class ChannelState:
+    """
+    State of a channel in the Stasis application and of the resources created for it.
+
+    Snoop, external media, bridge, RTP and speaker fields come in pairs, one per
+    audio direction ('in' and 'out'). Resource fields stay None until the resource
+    has been created in Asterisk.
+    """
+    __slots__ = (
+        'language',
+        'caller_name',
+        'caller_number',
+        'connected_name',
+        'connected_number',
+        'linkedid',
+        'call_start_epoch',
+        'call_elapsed_at_start',
+        'transcription_requested',
+        'connector',
+        'connector_started',
+        'snoop_channel_in',
+        'snoop_channel_out',
+        'external_media_channel_in',
+        'external_media_channel_out',
+        'bridge_in',
+        'bridge_out',
+        'rtp_source_port_in',
+        'rtp_source_port_out',
+        'rtp_stream_in',
+        'rtp_stream_out',
+        'speaker_name_in',
+        'speaker_name_out',
+        'speaker_number_in',
+        'speaker_number_out',
+    )
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        self.transcription_requested = False
+        self.connector_started = False
+
 class AsteriskBridge:
     """
     Manages the interface between Asterisk PBX and speech recognition services.
@@ -30,38 +89,60 @@ class AsteriskBridge:
         self.url = url
         self.app = app
         self.auth = aiohttp.BasicAuth(username, password)
+        # ARI URLs never change for a bridge: build them once, not per request or reconnect
+        self._rest_base = f"{url}/ari"
+        self._ws_url = f"{url.replace('http', 'ws', 1)}/ari/events?app={app}&api_key={username}:{password}"
+        # Constant parts of the query strings sent while setting up a call
+        self._snoop_params = {'app': app, 'subscribeAll': 'yes'}
+        self._external_media_params = {
+            'app': app,
+            'external_host': f"{rtp_server.host}:{rtp_server.port}",
+            'format': 'slin16',
+        }
         self.mqtt_client = mqtt_client
         self.rtp_server = rtp_server
         self.channels = {}
+        # Snoop and external media channel ids -> id of the channel they belong to
+        self.snoop_to_original = {}
+        self.extmedia_to_original = {}
         self.ws = None
         self.session = None
         self.is_shutting_down = False
+        # Set by disconnect() to cut a pending reconnect delay short
+        self.shutdown_event = asyncio.Event()
         self.max_reconnect_delay = 30  # Maximum seconds between reconnection attempts
         self.pending_transcription_requests = set()
+        # ARI event type -> handler
+        self._event_handlers = {
+            'StasisStart': self._handle_stasis_start,
+            'channelHangup': self._handle_channel_hangup,
+            'StasisEnd': self._handle_stasis_end,
+            'ChannelLeftBridge': self._handle_channel_left_bridge,
+        }
 
     def _build_connector(self, channel_id):
         """Create a new Deepgram connector instance for a channel."""
         channel = self.channels[channel_id]
         return DeepgramConnector(
             deepgram_api_key=os.getenv("DEEPGRAM_API_KEY"),
-            rtp_stream_in=channel['rtp_stream_in'],
-            rtp_stream_out=channel['rtp_stream_out'],
+            rtp_stream_in=channel.rtp_stream_in,
+            rtp_stream_out=channel.rtp_stream_out,
             mqtt_client=self.mqtt_client,
-            uniqueid=channel.get('linkedid') or channel_id,
-            language=channel['language'],
-            speaker_name_in=channel['speaker_name_in'],
-            speaker_number_in=channel['speaker_number_in'],
-            speaker_name_out=channel['speaker_name_out'],
-            speaker_number_out=channel['speaker_number_out'],
-            call_elapsed_at_start=channel.get('call_elapsed_at_start'),
-            call_start_epoch=channel.get('call_start_epoch')
+            uniqueid=channel.linkedid or channel_id,
+            language=channel.language,
+            speaker_name_in=channel.speaker_name_in,
+            speaker_number_in=channel.speaker_number_in,
+            speaker_name_out=channel.speaker_name_out,
+            speaker_number_out=channel.speaker_number_out,
+            call_elapsed_at_start=channel.call_elapsed_at_start,
+            call_start_epoch=channel.call_start_epoch
         )
 
     def _find_channels_for_callid(self, call_id):
         """Resolve a call identifier (linkedid or uniqueid) to active channel IDs."""
         if call_id in self.channels:
             return [call_id]
-        return [cid for cid, cdata in self.channels.items() if cdata.get('linkedid') == call_id]
+        return [cid for cid, cdata in self.channels.items() if cdata.linkedid == call_id]
 
     def _extract_call_start_epoch(self, linkedid):
         """
@@ -105,11 +186,12 @@ class AsteriskBridge:
         Read an ARI channel variable, returning None when it does not exist.
         Missing variables are expected in some call phases and should not be noisy.
         """
-        url = f"{self.url}/ari/channels/{channel_id}/variable"
+        url = f"{self._rest_base}/channels/{channel_id}/variable"
         async with self.session.request(
             "GET",
             url,
             params={"variable": variable},
+            timeout=ARI_TIMEOUT,
         ) as response:
             if response.status == 404:
                 logger.debug(
@@ -125,14 +207,20 @@ class AsteriskBridge:
                 )
                 return None
 
-            data = await response.json()
+            data = await response.json(loads=orjson.loads)
             return data.get("value")
 
     async def connect(self):
         """Connect to Asterisk ARI and setup WebSocket for events"""
         logger.debug(f"Connect to Asterisk ARI at {self.url}")
         self.is_shutting_down = False
-        self.session = aiohttp.ClientSession(auth=self.auth)
+        self.shutdown_event.clear()
+        connector = aiohttp.TCPConnector(
+            limit=ARI_POOL_MAX_CONNECTIONS,
+            keepalive_timeout=ARI_POOL_KEEPALIVE_EXPIRY,
+        )
+        # The session owns the connector and closes it in disconnect()
+        self.session = aiohttp.ClientSession(auth=self.auth, connector=connector)
 
         # Connect to ARI WebSocket
         await self._connect_websocket()
@@ -140,8 +228,7 @@ class AsteriskBridge:
 
     async def _connect_websocket(self):
         """Connect to Asterisk ARI WebSocket"""
-        ws_url = f"{self.url.replace('http', 'ws')}/ari/events?app={self.app}&api_key={self.auth.login}:{self.auth.password}"
-        self.ws = await self.session.ws_connect(ws_url)
+        self.ws = await self.session.ws_connect(self._ws_url)
         # Start event loop
         asyncio.create_task(self._process_ari_events())
 
@@ -149,6 +236,7 @@ class AsteriskBridge:
         """Disconnect from Asterisk ARI"""
         logger.debug(f"Disconnect from Asterisk ARI")
         self.is_shutting_down = True
+        self.shutdown_event.set()
         for channel_id in list(self.channels.keys()):
             await self.close_channel(channel_id)
         if self.ws:
@@ -161,9 +249,11 @@ class AsteriskBridge:
         try:
             async for msg in self.ws:
                 if msg.type == aiohttp.WSMsgType.TEXT:
-                    event = json.loads(msg.data)
+                    if _HANDLED_EVENT_RE.search(msg.data) is None:
+                        continue
+                    event = orjson.loads(msg.data)
                     await self._handle_ari_event(event)
-                elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                elif msg.type in _WS_END_TYPES:
                     logger.warning("WebSocket connection closed or error occurred")
                     break
         except Exception as e:
@@ -175,12 +265,19 @@ class AsteriskBridge:
                 await self._reconnect()
 
     async def _reconnect(self):
-        """Attempt to reconnect to Asterisk with exponential backoff"""
-        delay = 1  # Start with 1 second delay
+        """Attempt to reconnect to Asterisk with exponential backoff and full jitter"""
+        delay = 1.0  # Start with up to 1 second delay
         while not self.is_shutting_down:
+            # Random wait up to the backoff delay, so satellites that lost the same
+            # Asterisk don't all reconnect at the same moment
+            sleep_for = random.uniform(0, delay)
+            logger.info(f"Attempting to reconnect in {sleep_for:.1f} seconds...")
+            try:
+                await asyncio.wait_for(self.shutdown_event.wait(), timeout=sleep_for)
+                return  # disconnect() was called while waiting
+            except asyncio.TimeoutError:
+                pass
             try:
-                logger.info(f"Attempting to reconnect in {delay} seconds...")
-                await asyncio.sleep(delay)
                 await self._connect_websocket()
                 logger.info("Successfully reconnected to Asterisk ARI")
                 return
@@ -192,15 +289,9 @@ class AsteriskBridge:
     async def _handle_ari_event(self, event):
         """Handle events from Asterisk ARI"""
         #logger.debug(f"ENTER: _handle_ari_event(type={event.get('type', 'unknown')})")
-        event_type = event.get('type')
-        if event_type == 'StasisStart':
-            await self._handle_stasis_start(event)
-        elif event_type == 'channelHangup':
-            await self._handle_channel_hangup(event)
-        elif event_type == 'StasisEnd':
-            await self._handle_stasis_end(event)
-        elif event_type == 'ChannelLeftBridge':
-            await self._handle_channel_left_bridge(event)
+        handler = self._event_handlers.get(event.get('type'))
+        if handler is not None:
+            await handler(event)
 
     async def _handle_stasis_start(self, event):
         """
@@ -219,32 +310,28 @@ class AsteriskBridge:
             # continue the channel
             await self._ari_request(
                 'POST',
-                f"/channels/{channel_id}/continue",
-                params={}
+                f"/channels/{channel_id}/continue"
             )
             logger.info(f"Channel {channel_id} returned to dialplan")
             return
 
         if not channel_id.startswith("snoop-") and not channel_id.startswith("ext-media-"):
             # Normal channel entered Stasis
-            self.channels[channel_id] = {}
-            self.channels[channel_id]['language'] = channel.get('language', 'en')
-            self.channels[channel_id]['caller_name'] = channel['caller'].get('name', 'caller')
-            self.channels[channel_id]['caller_number'] = channel['caller'].get('number', 'unknown')
-            self.channels[channel_id]['connected_name'] = channel['connected'].get('name', 'connected')
-            self.channels[channel_id]['connected_number'] = channel['connected'].get('number', 'unknown')
+            self.channels[channel_id] = state = ChannelState()
+            state.language = channel.get('language', 'en')
+            state.caller_name = channel['caller'].get('name', 'caller')
+            state.caller_number = channel['caller'].get('number', 'unknown')
+            state.connected_name = channel['connected'].get('name', 'connected')
+            state.connected_number = channel['connected'].get('number', 'unknown')
             linkedid = channel.get('linkedid')
             if not linkedid:
                 linkedid = await self._get_channel_variable(channel_id, "CHANNEL(linkedid)")
-            self.channels[channel_id]['linkedid'] = linkedid or channel_id
-            self.channels[channel_id]['call_start_epoch'] = self._extract_call_start_epoch(
-                self.channels[channel_id]['linkedid']
-            )
-            self.channels[channel_id]['transcription_requested'] = (
+            state.linkedid = linkedid or channel_id
+            state.call_start_epoch = self._extract_call_start_epoch(state.linkedid)
+            state.transcription_requested = (
                 channel_id in self.pending_transcription_requests
-                or self.channels[channel_id]['linkedid'] in self.pending_transcription_requests
+                or state.linkedid in self.pending_transcription_requests
             )
-            self.channels[channel_id]['connector_started'] = False
             self.pending_transcription_requests.discard(channel_id)
             logger.debug(f"Channel {channel_id} entered Satellite. Details: {channel}")
             # Create a snoop channel for in and one for out
@@ -252,119 +339,105 @@ class AsteriskBridge:
                 snoop_data = await self._ari_request(
                     'POST',
                     f"/channels/{channel_id}/snoop",
-                    params={
-                    'spy': direction,
-                    'app': self.app,
-                    'subscribeAll': 'yes',
-                    'snoopId': f'snoop-{direction}-{channel_id}'
-                    }
+                    params={**self._snoop_params, 'spy': direction, 'snoopId': f'snoop-{direction}-{channel_id}'}
                 )
                 snoop_channel_id = snoop_data['id']
-                self.channels[channel_id][f'snoop_channel_{direction}'] = snoop_channel_id
+                setattr(state, f'snoop_channel_{direction}', snoop_channel_id)
+                self.snoop_to_original[snoop_channel_id] = channel_id
                 logger.debug(f"Snoop channel {snoop_channel_id} created")
             try:
                 # Get connected info using ARI
                 connected_number = await self._get_channel_variable(channel_id, "CALLERIDNUMINTERNAL")
                 if connected_number:
-                    self.channels[channel_id]['connected_number'] = connected_number
+                    state.connected_number = connected_number
                     logger.debug(f"Updated connected number for channel {channel_id}: {connected_number}")
                 connected_name = await self._get_channel_variable(channel_id, "CALLERIDNAMEINTERNAL")
                 if connected_name:
-                    self.channels[channel_id]['connected_name'] = connected_name
+                    state.connected_name = connected_name
                     logger.debug(f"Updated connected name for channel {channel_id}: {connected_name}")
             except Exception as e:
                 logger.debug(f"connected info not updated for channel {channel_id}: {e}")
         if channel_id.startswith("snoop-"):
             # Snoop channel entered Stasis, create an external media channel for it
             snoop_channel_id = channel_id
-            for id,values in self.channels.items():
-                if values.get('snoop_channel_in') == snoop_channel_id or values.get('snoop_channel_out') == snoop_channel_id:
-                    # Find the original channel that created this snoop channel
-                    original_channel_id = id
-                    break
+            # Find the original channel that created this snoop channel
+            original_channel_id = self.snoop_to_original.get(snoop_channel_id)
+            if original_channel_id is None:
+                logger.debug(f"Snoop channel {snoop_channel_id} has no original channel")
+                return
+            state = self.channels[original_channel_id]
             direction = 'in' if 'snoop-in' in snoop_channel_id else 'out'
             ext_media_response = await self._ari_request(
                 'POST',
                 f"/channels/externalMedia",
-                params={
-                'app': self.app,
-                'external_host': f"{self.rtp_server.host}:{self.rtp_server.port}",
-                'format': 'slin16',
-                'channelId': f'ext-media-{direction}-{original_channel_id}',
-                }
+                params={**self._external_media_params, 'channelId': f'ext-media-{direction}-{original_channel_id}'}
             )
             #logger.debug(f"External media channel created: {ext_media_response}")
-            self.channels[original_channel_id][f'external_media_channel_{direction}'] = ext_media_response['id']
-            self.channels[original_channel_id][f'rtp_source_port_{direction}'] = ext_media_response['channelvars']['UNICASTRTP_LOCAL_PORT']
+            setattr(state, f'external_media_channel_{direction}', ext_media_response['id'])
+            self.extmedia_to_original[ext_media_response['id']] = original_channel_id
+            setattr(state, f'rtp_source_port_{direction}', ext_media_response['channelvars']['UNICASTRTP_LOCAL_PORT'])
 
         if channel_id.startswith("ext-media-"):
             # External media channel entered Stasis
-            for id,values in self.channels.items():
-                if values.get('external_media_channel_in') == channel_id or values.get('external_media_channel_out') == channel_id:
-                    # Find the original channel that created this external media channel
-                    original_channel_id = id
-                    break
+            # Find the original channel that created this external media channel
+            original_channel_id = self.extmedia_to_original.get(channel_id)
+            if original_channel_id is None:
+                logger.debug(f"External media channel {channel_id} has no original channel")
+                return
+            state = self.channels[original_channel_id]
             direction = 'in' if 'ext-media-in' in channel_id else 'out'
-            snoop_channel_id = self.channels[original_channel_id][f'snoop_channel_{direction}']
+            snoop_channel_id = getattr(state, f'snoop_channel_{direction}')
             external_media_channel_id = channel_id
             # Create bridge
             bridge_data = await self._ari_request(
                 'POST',
                 "/bridges",
-                params={
-                'type': 'mixing',
-                'bridgeId': f'bridge-{direction}-{original_channel_id}',
-                }
+                params={'type': 'mixing', 'bridgeId': f'bridge-{direction}-{original_channel_id}'}
             )
             bridge_id = bridge_data['id']
-            self.channels[original_channel_id][f'bridge_{direction}'] = bridge_id
-            # Add channels to the bridge
-            logger.debug(f"Adding channel {snoop_channel_id} to bridge {bridge_id}")
+            setattr(state, f'bridge_{direction}', bridge_id)
+            # Add both channels to the bridge in one request: addChannel takes a
+            # comma-separated list of channel ids
+            logger.debug(f"Adding channels {snoop_channel_id} and {external_media_channel_id} to bridge {bridge_id}")
             await self._ari_request(
                 'POST',
                 f"/bridges/{bridge_id}/addChannel",
-                params={'channel': snoop_channel_id}
-            )
-            logger.debug(f"Adding channel {external_media_channel_id} to bridge {bridge_id}")
-            await self._ari_request(
-                'POST',
-                f"/bridges/{bridge_id}/addChannel",
-                params={'channel': external_media_channel_id}
+                params={'channel': f"{snoop_channel_id},{external_media_channel_id}"}
             )
 
             # if both bridge are created, start the deepgram connector
-            if 'bridge_in' in self.channels[original_channel_id] and 'bridge_out' in self.channels[original_channel_id]:
+            if state.bridge_in is not None and state.bridge_out is not None:
                 try:
                     # get external media channel port and create a stream
-                    rtp_stream_in = await self.rtp_server.create_stream(self.channels[original_channel_id]['rtp_source_port_in'])
-                    rtp_stream_out = await self.rtp_server.create_stream(self.channels[original_channel_id]['rtp_source_port_out'])
+                    rtp_stream_in = await self.rtp_server.create_stream(state.rtp_source_port_in)
+                    rtp_stream_out = await self.rtp_server.create_stream(state.rtp_source_port_out)
 
                     # Wait a moment for RTP association to happen
                     await asyncio.sleep(0.1)
 
                     # Assign speaker names from channel info
-                    speaker_name_in = self.channels[original_channel_id]['caller_name']
-                    speaker_number_in = self.channels[original_channel_id]['caller_number']
-                    speaker_name_out = self.channels[original_channel_id]['connected_name']
-                    speaker_number_out = self.channels[original_channel_id]['connected_number']
+                    speaker_name_in = state.caller_name
+                    speaker_number_in = state.caller_number
+                    speaker_name_out = state.connected_name
+                    speaker_number_out = state.connected_number
 
                     # Check if Asterisk swapped the RTP ports by looking at the remote_addr
                     # If stream_in receives from port_out, ports ARE swapped -> swap speaker names
                     if rtp_stream_in.remote_addr:
                         source_port = rtp_stream_in.remote_addr[1]
-                        if source_port == int(self.channels[original_channel_id]['rtp_source_port_out']):
+                        if source_port == int(state.rtp_source_port_out):
                             speaker_name_in, speaker_name_out = speaker_name_out, speaker_name_in
                             speaker_number_in, speaker_number_out = speaker_number_out, speaker_number_in
 
-                    self.channels[original_channel_id]['rtp_stream_in'] = rtp_stream_in
-                    self.channels[original_channel_id]['rtp_stream_out'] = rtp_stream_out
-                    self.channels[original_channel_id]['speaker_name_in'] = speaker_name_in
-                    self.channels[original_channel_id]['speaker_number_in'] = speaker_number_in
-                    self.channels[original_channel_id]['speaker_name_out'] = speaker_name_out
-                    self.channels[original_channel_id]['speaker_number_out'] = speaker_number_out
+                    state.rtp_stream_in = rtp_stream_in
+                    state.rtp_stream_out = rtp_stream_out
+                    state.speaker_name_in = speaker_name_in
+                    state.speaker_number_in = speaker_number_in
+                    state.speaker_name_out = speaker_name_out
+                    state.speaker_number_out = speaker_number_out
 
                     # Start the connector only if a realtime transcription was requested.
-                    if self.channels[original_channel_id].get('transcription_requested'):
+                    if state.transcription_requested:
                         asyncio.create_task(self._start_connector(original_channel_id))
                 except Exception as e:
                     logger.error(f"Failed to start connector for channel {original_channel_id}: {e}")
@@ -372,8 +445,7 @@ class AsteriskBridge:
                 # Return control of original channel to dialplan
                 await self._ari_request(
                     'POST',
-                    f"/channels/{original_channel_id}/continue",
-                    params={}
+                    f"/channels/{original_channel_id}/continue"
                 )
                 logger.info(f"Channel {original_channel_id} returned to dialplan")
 
@@ -384,21 +456,21 @@ class AsteriskBridge:
                 return
 
             channel = self.channels[channel_id]
-            if channel.get('connector_started'):
+            if channel.connector_started:
                 return
 
-            if 'rtp_stream_in' not in channel or 'rtp_stream_out' not in channel:
+            if channel.rtp_stream_in is None or channel.rtp_stream_out is None:
                 logger.info(f"Transcription requested for {channel_id} but RTP streams are not ready yet")
                 return
 
-            if channel.get('call_elapsed_at_start') is None:
-                channel['call_elapsed_at_start'] = await self._get_answered_elapsed_seconds(channel_id)
+            if channel.call_elapsed_at_start is None:
+                channel.call_elapsed_at_start = await self._get_answered_elapsed_seconds(channel_id)
 
-            if 'connector' not in channel:
-                channel['connector'] = self._build_connector(channel_id)
+            if channel.connector is None:
+                channel.connector = self._build_connector(channel_id)
 
-            await channel['connector'].start()
-            channel['connector_started'] = True
+            await channel.connector.start()
+            channel.connector_started = True
             logger.info(f"Deepgram connector started for channel {channel_id}")
         except Exception as e:
             logger.error(f"Failed to start Deepgram connector for channel {channel_id}: {e}")
@@ -415,13 +487,10 @@ class AsteriskBridge:
             return
 
         for channel_id in channel_ids:
-            self.channels[channel_id]['transcription_requested'] = True
-            answered_elapsed = await self._get_answered_elapsed_seconds(channel_id)
-            if answered_elapsed is not None:
-                self.channels[channel_id]['call_elapsed_at_start'] = answered_elapsed
-            else:
-                self.channels[channel_id]['call_elapsed_at_start'] = None
-            if not self.channels[channel_id].get('connector_started'):
+            channel = self.channels[channel_id]
+            channel.transcription_requested = True
+            channel.call_elapsed_at_start = await self._get_answered_elapsed_seconds(channel_id)
+            if not channel.connector_started:
                 asyncio.create_task(self._start_connector(channel_id))
 
     async def stop_transcription(self, call_id):
@@ -436,14 +505,14 @@ class AsteriskBridge:
             channel = self.channels.get(channel_id)
             if channel is None:
                 continue
-            channel['transcription_requested'] = False
-            connector = channel.pop('connector', None)
+            channel.transcription_requested = False
+            connector, channel.connector = channel.connector, None
             if connector is not None:
                 try:
                     await connector.close()
                 except Exception as e:
                     logger.debug(f"Failed to close connector for channel {channel_id}: {e}")
-                channel['connector_started'] = False
+                channel.connector_started = False
 
     async def _handle_stasis_end(self, event):
         """Handle channel hangup event"""
@@ -458,18 +527,15 @@ class AsteriskBridge:
         channel = event['channel']
         channel_id = channel['id']
         logger.debug(f"_handle_channel_left_bridge(channel_id={channel_id})")
-        original_channel_id = None
-        for id, values in self.channels.items():
-            if values.get('snoop_channel_in') == channel_id or values.get('snoop_channel_out') == channel_id:
-                # Snoop channel left the bridge
-                logger.debug(f"Snoop channel {channel_id} left the bridge")
-                original_channel_id = id
-                break
-            if values.get('external_media_channel_in') == channel_id or values.get('external_media_channel_out') == channel_id:
+        original_channel_id = self.snoop_to_original.get(channel_id)
+        if original_channel_id is not None:
+            # Snoop channel left the bridge
+            logger.debug(f"Snoop channel {channel_id} left the bridge")
+        else:
+            original_channel_id = self.extmedia_to_original.get(channel_id)
+            if original_channel_id is not None:
                 # External media channel left the bridge
                 logger.debug(f"External media channel {channel_id} left the bridge")
-                original_channel_id = id
-                break
         if original_channel_id is not None:
             await self.close_channel(original_channel_id)
 
@@ -478,43 +544,43 @@ class AsteriskBridge:
         logger.debug(f"close_channel(channel_id={channel_id})")
         channel = self.channels.get(channel_id)
         if channel is not None:
-            # Close the deepgram connector
-            connector = channel.pop('connector', None)
+            # Drop the reverse entries first, so events for the snoop and external
+            # media channels arriving during teardown no longer resolve to this channel
+            self.snoop_to_original.pop(channel.snoop_channel_in, None)
+            self.snoop_to_original.pop(channel.snoop_channel_out, None)
+            self.extmedia_to_original.pop(channel.external_media_channel_in, None)
+            self.extmedia_to_original.pop(channel.external_media_channel_out, None)
+            # The connector, bridges and external media channels are independent:
+            # tear them down concurrently instead of one round trip after another
+            teardown = []
+            connector, channel.connector = channel.connector, None
             if connector is not None:
-                try:
-                    await connector.close()
-                except Exception as e:
-                    logger.debug(f"Failed to close connector for channel {channel_id}: {e}")
-            for direction in ['in', 'out']:
-                # Remove the bridge
-                if f'bridge_{direction}' in channel:
-                    try:
-                        await self._ari_request(
-                            'DELETE',
-                            f"/bridges/{channel[f'bridge_{direction}']}"
-                        )
-                    except Exception as e:
-                        logger.debug(f"Failed to delete bridge {channel[f'bridge_{direction}']}: {e}")
-                    del channel[f'bridge_{direction}']
-            for direction in ['in', 'out']:
-                # Remove the external media channel
-                if f'external_media_channel_{direction}' in channel:
-                    try:
-                        await self._ari_request(
-                            'DELETE',
-                            f"/channels/{channel[f'external_media_channel_{direction}']}"
-                        )
-                    except Exception as e:
-                        logger.debug(f"Failed to delete external media channel {channel[f'external_media_channel_{direction}']}: {e}")
-                    del channel[f'external_media_channel_{direction}']
-            for direction in ['in', 'out']:
-                # Remove the RTP stream
-                if f'rtp_source_port_{direction}' in channel:
-                    self.rtp_server.end_stream(channel[f'rtp_source_port_{direction}'])
-                    del channel[f'rtp_source_port_{direction}']
-                if f'rtp_stream_{direction}' in channel:
-                    del channel[f'rtp_stream_{direction}']
-            del self.channels[channel_id]
+                teardown.append((f"close connector for channel {channel_id}", connector.close()))
+            bridge_ids = (channel.bridge_in, channel.bridge_out)
+            channel.bridge_in = channel.bridge_out = None
+            for bridge_id in bridge_ids:
+                if bridge_id is not None:
+                    teardown.append((f"delete bridge {bridge_id}", self._ari_request('DELETE', f"/bridges/{bridge_id}")))
+            external_media_channel_ids = (channel.external_media_channel_in, channel.external_media_channel_out)
+            channel.external_media_channel_in = channel.external_media_channel_out = None
+            for external_media_channel_id in external_media_channel_ids:
+                if external_media_channel_id is not None:
+                    teardown.append((
+                        f"delete external media channel {external_media_channel_id}",
+                        self._ari_request('DELETE', f"/channels/{external_media_channel_id}"),
+                    ))
+            results = await asyncio.gather(*(coro for _, coro in teardown), return_exceptions=True)
+            for (action, _), result in zip(teardown, results):
+                if isinstance(result, Exception):
+                    logger.debug(f"Failed to {action}: {result}")
+            # Remove the RTP streams
+            for rtp_source_port in (channel.rtp_source_port_in, channel.rtp_source_port_out):
+                if rtp_source_port is not None:
+                    self.rtp_server.end_stream(rtp_source_port)
+            channel.rtp_source_port_in = channel.rtp_source_port_out = None
+            channel.rtp_stream_in = channel.rtp_stream_out = None
+            # A concurrent close_channel for the same channel may have finished first
+            self.channels.pop(channel_id, None)
         self.pending_transcription_requests.discard(channel_id)
 
     async def _handle_channel_hangup(self, event):
@@ -526,39 +592,36 @@ class AsteriskBridge:
             logger.error(f"Channel {channel_id} hangup: {event}")
             await self.close_channel(channel_id)
             return
-        original_channel_id = None
-        for id, values in self.channels.items():
-            if values.get('snoop_channel_in') == channel_id or values.get('snoop_channel_out') == channel_id:
-                # Snoop channel hangup
-                logger.debug(f"Snoop channel {channel_id} hangup")
-                original_channel_id = id
-                break
-            if values.get('external_media_channel_in') == channel_id or values.get('external_media_channel_out') == channel_id:
+        original_channel_id = self.snoop_to_original.get(channel_id)
+        if original_channel_id is not None:
+            # Snoop channel hangup
+            logger.debug(f"Snoop channel {channel_id} hangup")
+        else:
+            original_channel_id = self.extmedia_to_original.get(channel_id)
+            if original_channel_id is not None:
                 # External media channel hangup
                 logger.debug(f"External media channel {channel_id} hangup")
-                original_channel_id = id
-                break
         if original_channel_id is not None:
             await self.close_channel(original_channel_id)
 
     async def _ari_request(self, method, endpoint, params=None, json_data=None):
         """Make a request to the Asterisk ARI"""
-        logger.debug(f"ARI request(method={method}, endpoint={endpoint})")
-        url = f"{self.url}/ari{endpoint}"
-
+        # Lazy %-formatting: this runs for every ARI request, debug logging or not
+        logger.debug("ARI request(method=%s, endpoint=%s)", method, endpoint)
         async with self.session.request(
             method,
-            url,
+            self._rest_base + endpoint,
             params=params,
-            json=json_data
+            json=json_data,
+            timeout=ARI_TIMEOUT,
         ) as response:
             if response.status >= 400:
                 error_text = await response.text()
                 logger.error(f"ARI request failed: {response.status} - {error_text}")
                 raise Exception(f"ARI request failed: {response.status}")
 
-            # Handle 204 No Content responses
-            if response.status == 204:
+            # Handle 204 No Content responses; callers never use the body of a DELETE
+            if response.status == 204 or method == 'DELETE':
                 return None
 
-            return await response.json()
+            return await response.json(loads=orjson.loads)
@@ -1,23 +1,59 @@
-import json
+import asyncio
 import logging
 import os
 import sys
-from typing import Any, Dict
+import time
+from typing import Any, Dict, List, Optional
+
+import orjson
 
 import ai
 import db
 
 logger = logging.getLogger("call_processor")
 
+# Same budget the API waits for a job. The AI stage gives up inside the worker
+# too, so a timed-out job frees its worker instead of running on.
+CALL_PROCESSOR_TIMEOUT_SECONDS = float(os.getenv("CALL_PROCESSOR_TIMEOUT_SECONDS", "600"))
+
+# One event loop per process, reused across calls: the shared AsyncOpenAI client
+# keeps its pooled connections bound to the loop that opened them.
+_runner: Optional[asyncio.Runner] = None
+
+
+def _remaining(deadline: float) -> float:
+    """Seconds left until deadline (a time.time() value); raise TimeoutError once it has passed."""
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise TimeoutError("Call processing deadline exceeded")
+    return remaining
+
+
+async def _with_deadline(coro, deadline: float):
+    async with asyncio.timeout(_remaining(deadline)):
+        return await coro
+
+
+def _run(coro, deadline: float):
+    global _runner
+    if _runner is None:
+        _runner = asyncio.Runner()
+    return _runner.run(_with_deadline(coro, deadline))
+
 
 def _read_stdin_json() -> Dict[str, Any]:
-    raw = sys.stdin.read()
+    # Parse the bytes directly; large transcripts skip a full str decode.
+    raw = sys.stdin.buffer.read()
     if not raw.strip():
         raise ValueError("Expected JSON on stdin")
-    return json.loads(raw)
+    return orjson.loads(raw)
+
 
+def _read_stdin_jsonl() -> List[Dict[str, Any]]:
+    return [orjson.loads(line) for line in sys.stdin.buffer.read().splitlines() if line.strip()]
 
-def main() -> int:
+
+def configure_logging() -> None:
     log_level_str = os.getenv("LOG_LEVEL", "INFO").upper()
     log_level = getattr(logging, log_level_str, logging.INFO)
     logging.basicConfig(
@@ -25,50 +61,140 @@ def main() -> int:
         format="%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s",
     )
 
-    try:
-        payload = _read_stdin_json()
-        transcript_id = int(payload["transcript_id"])
-        raw_transcription = str(payload["raw_transcription"])
-        summary = bool(payload.get("summary", False))
 
+async def _embed_and_enrich(raw_transcription: str):
+    """Embed the transcript while the AI pipeline runs on it.
+
+    Returns (embedding result, AI result); a failed side is returned as its exception.
+    """
+
+    # Both are independent OpenAI round trips: overlap them instead of waiting twice.
+    return await asyncio.gather(
+        asyncio.to_thread(db.embed_transcript, raw_transcription),
+        ai.generate_clean_summary_sentiment(raw_transcription),
+        return_exceptions=True,
+    )
+
+
+def process(
+    transcript_id: int,
+    raw_transcription: str,
+    summary: bool = False,
+    final_state: Optional[str] = None,
+    deadline: Optional[float] = None,
+) -> Optional[int]:
+    """Store embeddings and, when requested, AI fields for a transcript; return the sentiment.
+
+    When final_state is given, the transcript state is set to it once processing succeeds.
+    deadline is a time.time() value, normally set when the job was submitted: a job
+    still queued past it is skipped, and the AI stage is cut off when it is reached.
+    """
+
+    if deadline is None:
+        deadline = time.time() + CALL_PROCESSOR_TIMEOUT_SECONDS
+    _remaining(deadline)
+
+    logger.info(
+        "Processing transcript_id=%s raw_len=%d summary=%s",
+        transcript_id,
+        len(raw_transcription or ""),
+        summary,
+    )
+
+    if not db.is_configured():
+        return None
+
+    enrichment = None
+    if not summary:
+        logger.info("Skipping AI summary/sentiment (summary=false)")
+        chunks, vectors = db.embed_transcript(raw_transcription)
+    elif (enrichment := db.find_transcript_enrichment(raw_transcription)) is not None:
+        logger.info("Reusing stored AI enrichment of an identical transcript")
+        chunks, vectors = db.embed_transcript(raw_transcription)
+    else:
+        logger.info("Starting AI enrichment")
+        embedded, enrichment = _run(_embed_and_enrich(raw_transcription), deadline)
+        if isinstance(embedded, BaseException):
+            if not isinstance(enrichment, BaseException):
+                # Keep the AI fields so a retry reuses them via find_transcript_enrichment.
+                db.finalize_transcript(transcript_id=transcript_id, chunks=[], vectors=[], enrichment=enrichment)
+            raise embedded
+        chunks, vectors = embedded
+        if isinstance(enrichment, BaseException):
+            # Keep the embeddings even when enrichment fails.
+            db.finalize_transcript(transcript_id=transcript_id, chunks=chunks, vectors=vectors)
+            raise enrichment
+        cleaned, summary_text, sentiment = enrichment
         logger.info(
-            "Processing transcript_id=%s raw_len=%d summary=%s",
-            transcript_id,
-            len(raw_transcription or ""),
-            summary,
+            "AI enrichment done (cleaned_len=%d summary_len=%d sentiment=%s)",
+            len(cleaned or ""),
+            len(summary_text or ""),
+            sentiment,
         )
 
-        if db.is_configured():
-            db.replace_transcript_embeddings(
-                transcript_id=transcript_id,
-                raw_transcription=raw_transcription,
-            )
-
-            if not summary:
-                logger.info("Skipping AI summary/sentiment (summary=false)")
-                sys.stdout.write(json.dumps({"ok": True, "sentiment": None}))
-                return 0
-
-            logger.info("Starting AI enrichment")
-            cleaned, summary, sentiment = ai.generate_clean_summary_sentiment(raw_transcription)
-            logger.info(
-                "AI enrichment done (cleaned_len=%d summary_len=%d sentiment=%s)",
-                len(cleaned or ""),
-                len(summary or ""),
-                sentiment,
-            )
-
-            db.update_transcript_ai_fields(
-                transcript_id=transcript_id,
-                cleaned_transcription=cleaned,
-                summary=summary,
-                sentiment=sentiment,
-            )
-            sys.stdout.write(json.dumps({"ok": True, "sentiment": sentiment}))
+    # Embeddings, AI fields and the final state go to Postgres in one transaction.
+    db.finalize_transcript(
+        transcript_id=transcript_id,
+        chunks=chunks,
+        vectors=vectors,
+        enrichment=enrichment,
+        state=final_state,
+    )
+    return enrichment[2] if enrichment is not None else None
+
+
+def process_batch(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Enrich a backlog of stored transcripts through the OpenAI Batch API.
+
+    Each item has transcript_id and raw_transcription. The Batch API trades
+    latency (up to 24h) for cost, so this is meant for offline backfills; the
+    transcript states are left as they are.
+    """
+
+    if not db.is_configured() or not items:
+        return []
+
+    texts = [str(item["raw_transcription"]) for item in items]
+    logger.info("Processing transcript backlog (transcripts=%d)", len(texts))
+    # No CALL_PROCESSOR_TIMEOUT_SECONDS here: a batch may legitimately take hours.
+    enrichments = asyncio.run(ai.generate_clean_summary_sentiment_batched(texts))
+
+    results = []
+    for item, raw_transcription, enrichment in zip(items, texts, enrichments):
+        transcript_id = int(item["transcript_id"])
+        chunks, vectors = db.embed_transcript(raw_transcription)
+        db.finalize_transcript(transcript_id=transcript_id, chunks=chunks, vectors=vectors, enrichment=enrichment)
+        results.append({"transcript_id": transcript_id, "sentiment": enrichment[2]})
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    configure_logging()
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv == ["--batch"]:
+        # Backlog mode: one {"transcript_id", "raw_transcription"} object per stdin line.
+        try:
+            results = process_batch(_read_stdin_jsonl())
+            sys.stdout.buffer.write(orjson.dumps({"ok": True, "results": results}))
+            return 0
+        except Exception:
+            logger.exception("Batch call processing failed")
+            sys.stdout.buffer.write(orjson.dumps({"ok": False}))
+            return 1
+
+    try:
+        payload = _read_stdin_json()
+        sentiment = process(
+            int(payload["transcript_id"]),
+            str(payload["raw_transcription"]),
+            bool(payload.get("summary", False)),
+        )
+        sys.stdout.buffer.write(orjson.dumps({"ok": True, "sentiment": sentiment}))
         return 0
     except Exception:
         logger.exception("Call processing failed")
-        sys.stdout.write(json.dumps({"ok": False}))
+        sys.stdout.buffer.write(orjson.dumps({"ok": False}))
         return 1
 
 
@@ -1,10 +1,14 @@
+import asyncio
+import hashlib
 import logging
 import os
 import re
 import threading
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
 
 import psycopg
+from psycopg_pool import AsyncConnectionPool
 from pgvector.psycopg import register_vector
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -24,6 +28,9 @@ TRANSCRIPT_STATES = ("progress", "failed", "summarizing", "done")
 _schema_lock = threading.Lock()
 _schema_initialized = False
 
+# Connection pool for the async API path, opened by the API at startup.
+_apool: Optional[AsyncConnectionPool] = None
+
 
 def is_configured() -> bool:
     required = [
@@ -72,6 +79,51 @@ def _connect_without_pgvector() -> psycopg.Connection:
     return psycopg.connect(_conninfo())
 
 
+async def _aconnect() -> psycopg.AsyncConnection:
+    # Only used for the transcripts table, which has no vector columns, so
+    # pgvector types don't need to be registered.
+    return await psycopg.AsyncConnection.connect(_conninfo())
+
+
+@asynccontextmanager
+async def _aconnection():
+    """Yield an async connection, from the pool when it is open."""
+    if _apool is not None:
+        async with _apool.connection() as conn:
+            yield conn
+    else:
+        async with await _aconnect() as conn:
+            yield conn
+
+
+async def aopen_pool() -> None:
+    """Open the async connection pool used by the a* functions."""
+    global _apool
+    if _apool is not None:
+        return
+    pool = AsyncConnectionPool(
+        _conninfo(),
+        min_size=max(1, int(os.getenv("PGVECTOR_POOL_MIN_SIZE", "2"))),
+        max_size=max(1, int(os.getenv("PGVECTOR_POOL_MAX_SIZE", "20"))),
+        open=False,
+    )
+    # Connections are filled in the background; startup does not wait for Postgres.
+    await pool.open(wait=False)
+    _apool = pool
+
+
+async def aclose_pool() -> None:
+    global _apool
+    pool, _apool = _apool, None
+    if pool is not None:
+        await pool.close()
+
+
+async def _aensure_schema() -> None:
+    if not _schema_initialized:
+        await asyncio.to_thread(_ensure_schema)
+
+
 def _ensure_schema() -> None:
     global _schema_initialized
     if _schema_initialized:
@@ -125,6 +177,11 @@ def _ensure_schema() -> None:
                 "CREATE INDEX IF NOT EXISTS transcript_chunks_transcript_id_idx ON transcript_chunks (transcript_id)"
             )
 
+            # Finds earlier enrichments of an identical transcript (see find_transcript_enrichment).
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS transcripts_raw_md5_idx ON transcripts (md5(raw_transcription))"
+            )
+
             # Commit the core schema changes explicitly for clarity.
             conn.commit()
 
@@ -147,13 +204,14 @@ def _ensure_schema() -> None:
         _schema_initialized = True
 
 
-_uniqueid_re = re.compile(r"^\d+\.\d+$")
+_uniqueid_re = re.compile(r"\d+\.\d+")
 
 
 def validate_uniqueid(uniqueid: str) -> None:
-    if not uniqueid or not uniqueid.strip():
+    uniqueid = (uniqueid or "").strip()
+    if not uniqueid:
         raise ValueError("Missing required form field 'uniqueid'")
-    if not _uniqueid_re.match(uniqueid.strip()):
+    if not _uniqueid_re.fullmatch(uniqueid):
         raise ValueError("Invalid 'uniqueid' format; expected like 1234567890.1234")
 
 
@@ -162,6 +220,36 @@ def validate_transcript_state(state: str) -> None:
         raise ValueError(f"Invalid transcript state {state!r}; expected one of {', '.join(TRANSCRIPT_STATES)}")
 
 
+_UPSERT_PROGRESS_SQL = """
+    INSERT INTO transcripts (uniqueid, raw_transcription, state)
+    VALUES (%s, %s, 'progress')
+    ON CONFLICT (uniqueid)
+    DO UPDATE SET
+        state = 'progress',
+        updated_at = now()
+    RETURNING id
+"""
+
+_SET_STATE_SQL = """
+    UPDATE transcripts
+    SET state = %s,
+        updated_at = now()
+    WHERE id = %s
+"""
+
+# A NULL state keeps the current one (or the 'done' default for new rows).
+_UPSERT_RAW_SQL = """
+    INSERT INTO transcripts (uniqueid, raw_transcription, state)
+    VALUES (%s, %s, COALESCE(%s, 'done'))
+    ON CONFLICT (uniqueid)
+    DO UPDATE SET
+        raw_transcription = EXCLUDED.raw_transcription,
+        state = COALESCE(%s, transcripts.state),
+        updated_at = now()
+    RETURNING id
+"""
+
+
 def upsert_transcript_progress(*, uniqueid: str) -> int:
     """Ensure a transcript row exists and mark it as 'progress'. Returns transcript id.
 
@@ -173,18 +261,22 @@ def upsert_transcript_progress(*, uniqueid: str) -> int:
     _ensure_schema()
 
     with _connect() as conn:
-        row = conn.execute(
-            """
-            INSERT INTO transcripts (uniqueid, raw_transcription, state)
-            VALUES (%s, %s, 'progress')
-            ON CONFLICT (uniqueid)
-            DO UPDATE SET
-                state = 'progress',
-                updated_at = now()
-            RETURNING id
-            """,
-            (uniqueid, ""),
-        ).fetchone()
+        row = conn.execute(_UPSERT_PROGRESS_SQL, (uniqueid, "")).fetchone()
+
+        if row is None:
+            raise RuntimeError("Failed to upsert transcript progress row")
+        return int(row[0])
+
+
+async def aupsert_transcript_progress(*, uniqueid: str) -> int:
+    """Async variant of upsert_transcript_progress for the API event loop."""
+
+    validate_uniqueid(uniqueid)
+    await _aensure_schema()
+
+    async with _aconnection() as conn:
+        cursor = await conn.execute(_UPSERT_PROGRESS_SQL, (uniqueid, ""))
+        row = await cursor.fetchone()
 
         if row is None:
             raise RuntimeError("Failed to upsert transcript progress row")
@@ -196,15 +288,17 @@ def set_transcript_state(*, transcript_id: int, state: str) -> None:
     _ensure_schema()
 
     with _connect() as conn:
-        conn.execute(
-            """
-            UPDATE transcripts
-            SET state = %s,
-                updated_at = now()
-            WHERE id = %s
-            """,
-            (state, transcript_id),
-        )
+        conn.execute(_SET_STATE_SQL, (state, transcript_id))
+
+
+async def aset_transcript_state(*, transcript_id: int, state: str) -> None:
+    """Async variant of set_transcript_state for the API event loop."""
+
+    validate_transcript_state(state)
+    await _aensure_schema()
+
+    async with _aconnection() as conn:
+        await conn.execute(_SET_STATE_SQL, (state, transcript_id))
 
 
 def set_transcript_state_by_uniqueid(*, uniqueid: str, state: str) -> None:
@@ -228,51 +322,116 @@ def upsert_transcript_raw(
     *,
     uniqueid: str,
     raw_transcription: str,
+    final_state: Optional[str] = None,
 ) -> int:
-    """Insert or update the raw transcript row and return its transcript id."""
+    """Insert or update the raw transcript row and return its transcript id.
+
+    When final_state is given, the row's state is set in the same statement.
+    """
 
     validate_uniqueid(uniqueid)
+    if final_state is not None:
+        validate_transcript_state(final_state)
     _ensure_schema()
 
     with _connect() as conn:
-        row = conn.execute(
-            """
-            INSERT INTO transcripts (uniqueid, raw_transcription)
-            VALUES (%s, %s)
-            ON CONFLICT (uniqueid)
-            DO UPDATE SET
-                raw_transcription = EXCLUDED.raw_transcription,
-                updated_at = now()
-            RETURNING id
-            """,
-            (uniqueid, raw_transcription),
-        ).fetchone()
+        row = conn.execute(_UPSERT_RAW_SQL, (uniqueid, raw_transcription, final_state, final_state)).fetchone()
 
         if row is None:
             raise RuntimeError("Failed to upsert transcript")
         return int(row[0])
 
 
+async def aupsert_transcript_raw(
+    *,
+    uniqueid: str,
+    raw_transcription: str,
+    final_state: Optional[str] = None,
+) -> int:
+    """Async variant of upsert_transcript_raw for the API event loop."""
+
+    validate_uniqueid(uniqueid)
+    if final_state is not None:
+        validate_transcript_state(final_state)
+    await _aensure_schema()
+
+    async with _aconnection() as conn:
+        cursor = await conn.execute(_UPSERT_RAW_SQL, (uniqueid, raw_transcription, final_state, final_state))
+        row = await cursor.fetchone()
+
+        if row is None:
+            raise RuntimeError("Failed to upsert transcript")
+        return int(row[0])
+
+
+_UPDATE_AI_FIELDS_SQL = """
+UPDATE transcripts
+SET cleaned_transcription = %s,
+    summary = %s,
+    sentiment = %s,
+    state = COALESCE(%s, state),
+    updated_at = now()
+WHERE id = %s
+"""
+
+# The call processor's final state only replaces 'summarizing': once the API has
+# given up on a timed-out job and marked it 'failed', a late worker must not
+# turn it back into 'done'. The AI fields are still stored.
+_FINALIZE_AI_FIELDS_SQL = """
+UPDATE transcripts
+SET cleaned_transcription = %s,
+    summary = %s,
+    sentiment = %s,
+    state = CASE WHEN state = 'summarizing' THEN COALESCE(%s, state) ELSE state END,
+    updated_at = now()
+WHERE id = %s
+"""
+
+_FINALIZE_STATE_SQL = """
+UPDATE transcripts
+SET state = %s,
+    updated_at = now()
+WHERE id = %s
+  AND state = 'summarizing'
+"""
+
+_FIND_ENRICHMENT_SQL = """
+SELECT cleaned_transcription, summary, sentiment
+FROM transcripts
+WHERE md5(raw_transcription) = %s
+  AND raw_transcription = %s
+  AND summary IS NOT NULL
+  AND cleaned_transcription IS NOT NULL
+ORDER BY updated_at DESC
+LIMIT 1
+"""
+
+_DELETE_CHUNKS_SQL = "DELETE FROM transcript_chunks WHERE transcript_id = %s"
+
+_INSERT_CHUNK_SQL = """
+INSERT INTO transcript_chunks (transcript_id, chunk_index, content, embedding)
+VALUES (%s, %s, %s, %s)
+"""
+
+
 def update_transcript_ai_fields(
     *,
     transcript_id: int,
     cleaned_transcription: str,
     summary: str,
     sentiment: Optional[int],
+    state: Optional[str] = None,
 ) -> None:
+    """Store the AI fields; when state is given it is set in the same UPDATE."""
+
+    if state is not None:
+        validate_transcript_state(state)
     _ensure_schema()
 
     with _connect() as conn:
         conn.execute(
-            """
-            UPDATE transcripts
-            SET cleaned_transcription = %s,
-                summary = %s,
-                sentiment = %s,
-                updated_at = now()
-            WHERE id = %s
-            """,
-            (cleaned_transcription, summary, sentiment, transcript_id),
+            _UPDATE_AI_FIELDS_SQL,
+            (cleaned_transcription, summary, sentiment, state, transcript_id),
         )
 
 
@@ -286,6 +445,75 @@ def _split_text_for_embedding(text: str) -> List[str]:
     return [c for c in chunks if c]
 
 
+def find_transcript_enrichment(raw_transcription: str) -> Optional[Tuple[str, str, Optional[int]]]:
+    """Return (cleaned, summary, sentiment) already stored for an identical transcript, if any.
+
+    Lets a retried upload reuse the earlier AI output instead of paying for it again.
+    """
+
+    _ensure_schema()
+
+    digest = hashlib.md5(raw_transcription.encode("utf-8")).hexdigest()
+    with _connect_without_pgvector() as conn:
+        row = conn.execute(_FIND_ENRICHMENT_SQL, (digest, raw_transcription)).fetchone()
+    return tuple(row) if row is not None else None
+
+
+def embed_transcript(raw_transcription: str) -> Tuple[List[str], List[List[float]]]:
+    """Split a transcript for embedding and embed the chunks. Returns (chunks, vectors)."""
+
+    chunks = _split_text_for_embedding(raw_transcription)
+    if not chunks:
+        return [], []
+
+    embedder = OpenAIEmbeddings(model=_EMBEDDING_MODEL)
+    return chunks, embedder.embed_documents(chunks)
+
+
+def _write_transcript_chunks(
+    conn: psycopg.Connection,
+    transcript_id: int,
+    chunks: List[str],
+    vectors: List[List[float]],
+) -> None:
+    conn.execute(_DELETE_CHUNKS_SQL, (transcript_id,))
+    # executemany pipelines the inserts: one round trip instead of one per chunk.
+    with conn.cursor() as cursor:
+        cursor.executemany(
+            _INSERT_CHUNK_SQL,
+            [(transcript_id, idx, chunk, vector) for idx, (chunk, vector) in enumerate(zip(chunks, vectors))],
+        )
+
+
+def finalize_transcript(
+    *,
+    transcript_id: int,
+    chunks: List[str],
+    vectors: List[List[float]],
+    enrichment: Optional[Tuple[str, str, Optional[int]]] = None,
+    state: Optional[str] = None,
+) -> None:
+    """Store chunk embeddings, AI fields and state for a transcript in one transaction.
+
+    enrichment is the (cleaned_transcription, summary, sentiment) tuple from
+    ai.generate_clean_summary_sentiment. Chunks are replaced only when there
+    are any, like replace_transcript_embeddings. state is only applied to a
+    transcript that is still 'summarizing'.
+    """
+
+    if state is not None:
+        validate_transcript_state(state)
+    _ensure_schema()
+
+    with _connect() as conn:
+        if chunks:
+            _write_transcript_chunks(conn, transcript_id, chunks, vectors)
+        if enrichment is not None:
+            conn.execute(_FINALIZE_AI_FIELDS_SQL, (*enrichment, state, transcript_id))
+        elif state is not None:
+            conn.execute(_FINALIZE_STATE_SQL, (state, transcript_id))
+
+
 def replace_transcript_embeddings(
     *,
     transcript_id: int,
@@ -299,22 +527,11 @@ def replace_transcript_embeddings(
     if uniqueid is not None:
         validate_uniqueid(uniqueid)
 
-    chunks = _split_text_for_embedding(raw_transcription)
+    chunks, vectors = embed_transcript(raw_transcription)
     if not chunks:
         return 0
 
-    embedder = OpenAIEmbeddings(model=_EMBEDDING_MODEL)
-    vectors = embedder.embed_documents(chunks)
-
     with _connect() as conn:
-        conn.execute("DELETE FROM transcript_chunks WHERE transcript_id = %s", (transcript_id,))
-        for idx, (chunk, vector) in enumerate(zip(chunks, vectors)):
-            conn.execute(
-                """
-                INSERT INTO transcript_chunks (transcript_id, chunk_index, content, embedding)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (transcript_id, idx, chunk, vector),
-            )
+        _write_transcript_chunks(conn, transcript_id, chunks, vectors)
 
     return len(chunks)
@@ -1,28 +1,37 @@
 import asyncio
+import copy
+import importlib.util
 import logging
 import os
 import signal
+import subprocess
+import sys
 from dotenv import load_dotenv
 import threading
 import uvicorn
+import uvicorn.config
+
+# Load environment variables before importing modules that read them at import time
+load_dotenv(dotenv_path=".env")
+
 from api import app as api_app
 from asterisk_bridge import AsteriskBridge
 from mqtt_client import MQTTClient
 from rtp_server import RTPServer
 
-
-# Load environment variables
-load_dotenv(dotenv_path=".env")
-
 # Configure logging
 log_level_str = os.getenv("LOG_LEVEL", "INFO").upper()
 log_level = getattr(logging, log_level_str, logging.INFO)
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
 logging.basicConfig(
     level=log_level,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
+    format=LOG_FORMAT
 )
 logger = logging.getLogger("main")
 
+# Number of API server processes; more than one runs the API apart from the realtime pipeline.
+API_WORKERS = max(1, int(os.getenv("API_WORKERS", "1")))
+
 # For graceful shutdown
 shutdown_event = asyncio.Event()
 
@@ -116,14 +125,66 @@ async def realtime_call_transcription():
     await mqtt_client.disconnect()
     logger.info("Shutdown complete")
 
-if __name__ == "__main__":
-    # Start API server in a background thread
-    server_thread = threading.Thread(
-        target=uvicorn.run,
-        args=(api_app,),
-        kwargs={"host": "0.0.0.0", "port": int(os.getenv("HTTP_PORT", "8000")), "log_level": os.getenv("LOG_LEVEL", "info").lower()},
-        daemon=True
+def _api_log_config() -> dict:
+    # uvicorn workers are fresh processes: give their root logger the same setup as this one.
+    config = copy.deepcopy(uvicorn.config.LOGGING_CONFIG)
+    config["formatters"]["satellite"] = {"format": LOG_FORMAT}
+    config["handlers"]["satellite"] = {
+        "class": "logging.StreamHandler",
+        "formatter": "satellite",
+        "stream": "ext://sys.stderr",
+    }
+    config["root"] = {"handlers": ["satellite"], "level": log_level}
+    return config
+
+
+def _server_kwargs() -> dict:
+    return {"host": "0.0.0.0", "port": int(os.getenv("HTTP_PORT", "8000")), "log_level": os.getenv("LOG_LEVEL", "info").lower()}
+
+
+def _serve_api_workers() -> None:
+    uvicorn.run("api:app", workers=API_WORKERS, log_config=_api_log_config(), **_server_kwargs())
+
+
+def _start_api_workers() -> subprocess.Popen:
+    # uvicorn's multi-process supervisor installs signal handlers, so it needs
+    # a main thread of its own: run it as a separate interpreter. stdin is
+    # /dev/null on fd 0 there, which uvicorn can hand down to its spawned
+    # workers (a multiprocessing child's private stdin fd is not inherited by
+    # them, and reopening it fails with EBADF).
+    return subprocess.Popen(
+        [sys.executable, "-c", "import main; main._serve_api_workers()"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdin=subprocess.DEVNULL,
     )
-    server_thread.start()
-    # Run the realtime call transcription pipeline
-    asyncio.run(realtime_call_transcription())
+
+
+if __name__ == "__main__":
+    api_process = None
+    if API_WORKERS > 1:
+        api_process = _start_api_workers()
+    else:
+        # Start API server in a background thread
+        server_thread = threading.Thread(
+            target=uvicorn.run,
+            args=(api_app,),
+            kwargs=_server_kwargs(),
+            daemon=True
+        )
+        server_thread.start()
+    try:
+        # Run the realtime call transcription pipeline. uvloop ships with
+        # uvicorn[standard]; its loop handles the RTP datagrams and ARI/MQTT/Deepgram
+        # sockets with less per-event overhead than the stock one.
+        if importlib.util.find_spec("uvloop") is not None:
+            import uvloop
+            uvloop.run(realtime_call_transcription())
+        else:
+            asyncio.run(realtime_call_transcription())
+    finally:
+        if api_process is not None:
+            api_process.terminate()
+            try:
+                api_process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                api_process.kill()
@@ -24,7 +24,7 @@ class MessageValidator:
         if isinstance(payload, str) and payload.strip().startswith('{') and payload.strip().endswith('}'):
             try:
                 payload = json.loads(payload)
-                logger.debug(f"Parsed JSON string payload for topic {topic_path}")
+                logger.debug("Parsed JSON string payload for topic %s", topic_path)
             except json.JSONDecodeError:
                 logger.warning(f"Failed to parse payload as JSON: {payload}")
 
@@ -187,7 +187,7 @@ class MQTTClient:
 
         try:
             await self.client.publish(full_topic, payload)
-            logger.debug(f"Published message to {full_topic}: {payload[:100]}...")
+            logger.debug("Published message to %s: %.100s...", full_topic, payload)
             return True
         except Exception as e:
             logger.error(f"Failed to publish message to {full_topic}: {e}")
@@ -0,0 +1,224 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import ai
+
+
+class _FakeBatchClient:
+    """OpenAI client stand-in answering Batch API jobs from the submitted JSONL."""
+
+    def __init__(self):
+        self.submitted = []
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    async def _create_file(self, *, file, purpose):
+        assert purpose == "batch"
+        self.submitted.append([json.loads(line) for line in file[1].decode("utf-8").splitlines()])
+        return SimpleNamespace(id=f"file-{len(self.submitted)}")
+
+    async def _create_batch(self, *, input_file_id, endpoint, completion_window):
+        return SimpleNamespace(id=f"batch-{input_file_id}", status="validating", output_file_id=None)
+
+    async def _retrieve_batch(self, batch_id):
+        return SimpleNamespace(id=batch_id, status="completed", output_file_id=f"out-{batch_id}")
+
+    async def _file_content(self, file_id):
+        lines = [
+            json.dumps(
+                {
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {"choices": [{"message": {"content": self._answer(request)}}]},
+                    },
+                }
+            )
+            for request in self.submitted[-1]
+        ]
+        return SimpleNamespace(text="\n".join(lines))
+
+    @staticmethod
+    def _answer(request: dict) -> str:
+        custom_id = request["custom_id"]
+        text = request["body"]["messages"][-1]["content"]
+        if ":sentiment:" in custom_id:
+            return '{"sentiment": 7}'
+        if custom_id.startswith("group:"):
+            count = text.count("===CHUNK ")
+            return "\n".join(f"===SUMMARY {n}===\nsummary {n}" for n in range(1, count + 1))
+        return f"{custom_id.split(':')[1]} output"
+
+
+async def test_batched_pipeline_builds_jsonl_and_parses_results(monkeypatch: pytest.MonkeyPatch):
+    client = _FakeBatchClient()
+    monkeypatch.setattr(ai, "_client", lambda: client)
+    monkeypatch.setattr(ai, "_BATCH_POLL_SECONDS", 0)
+
+    texts = ["Alice: Hello, how can I help you today?", "Bob: I would like to cancel my order, please."]
+    results = await ai.generate_clean_summary_sentiment_batched(texts)
+
+    # Short, well-formed texts skip cleaning: one batch with the grouped summary
+    # and a sentiment request per text; single-chunk texts need no reduce.
+    assert len(client.submitted) == 1
+    requests = client.submitted[0]
+    assert [r["custom_id"] for r in requests] == ["group:summarize:0", "0:sentiment:0", "1:sentiment:0"]
+    assert all(r["method"] == "POST" and r["url"] == "/v1/chat/completions" for r in requests)
+    assert all(r["body"]["model"] == ai._MODEL for r in requests)
+    assert requests[1]["body"]["response_format"] == ai._SENTIMENT_RESPONSE_FORMAT
+    assert results == [(texts[0], "summary 1", 7), (texts[1], "summary 2", 7)]
+
+
+async def test_run_batch_rejects_failed_request_lines(monkeypatch: pytest.MonkeyPatch):
+    client = _FakeBatchClient()
+
+    async def failed_content(file_id):
+        return SimpleNamespace(text=json.dumps({"custom_id": "0:clean:0", "response": {"status_code": 500}}))
+
+    client.files.content = failed_content
+    monkeypatch.setattr(ai, "_BATCH_POLL_SECONDS", 0)
+
+    with pytest.raises(RuntimeError, match="0:clean:0"):
+        await ai._run_batch(client, [ai._batch_request("0:clean:0", "system", "{text}", "text")])
+
+
+def test_parse_multi_summary_skips_out_of_range_and_empty_sections():
+    text = "===SUMMARY 1===\nfirst\n===SUMMARY 2===\n\n===SUMMARY 3===\nout of range"
+
+    assert ai._parse_multi_summary(text, 2) == {0: "first"}
+
+
+def test_split_text_cuts_after_highest_priority_separator():
+    text = "aaaa bbbb. cccc dddd\n\neeee"
+
+    assert ai._split_text(text, 12) == ["aaaa bbbb.", "cccc dddd", "eeee"]
+
+
+def test_split_text_chunks_are_bounded_and_do_not_overlap():
+    text = " ".join(f"word{i}" for i in range(200))
+
+    chunks = ai._split_text(text, 50)
+
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert " ".join(chunks) == text
+
+
+def test_split_text_hard_cuts_without_separator():
+    assert ai._split_text("abcdefghij", 4) == ["abcd", "efgh", "ij"]
+
+
+def test_summarize_inputs_splits_only_oversize_text(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(ai, "_CHUNK_SIZE", 20)
+
+    assert ai._summarize_inputs("short text") == ["short text"]
+    assert ai._summarize_inputs("first sentence. second sentence. third") == [
+        "first sentence.",
+        "second sentence.",
+        "third",
+    ]
+
+
+def test_group_for_summary_respects_group_size_and_chunk_budget(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(ai, "_CHUNK_SIZE", 10)
+    monkeypatch.setattr(ai, "_SUMMARIZE_GROUP_SIZE", 3)
+
+    small = [(0, idx, "abc") for idx in range(4)]
+    assert ai._group_for_summary(small) == [small[:3], small[3:]]
+
+    sized = [(0, 0, "a" * 6), (0, 1, "b" * 5), (1, 0, "c" * 4)]
+    assert ai._group_for_summary(sized) == [sized[:1], sized[1:]]
+
+
+async def test_tree_reduce_merges_pairs_in_order_before_final_reduce(monkeypatch: pytest.MonkeyPatch):
+    merges = []
+    reduces = []
+
+    async def fake_merge(summaries, semaphore):
+        merges.append(list(summaries))
+        return ai.MergedSummary(summary="(" + "+".join(summaries) + ")")
+
+    async def fake_reduce(summaries, semaphore):
+        reduces.append(list(summaries))
+        return ai.ReducedOutput(summary="(" + "+".join(summaries) + ")", sentiment=5)
+
+    monkeypatch.setattr(ai, "_merge", fake_merge)
+    monkeypatch.setattr(ai, "_reduce", fake_reduce)
+
+    result = await ai._tree_reduce([f"s{i}" for i in range(9)], semaphore=None)
+
+    # 9 > _TREE_REDUCE_MAX_SUMMARIES: one level of summary-only pair merges (the
+    # odd tail passes through), then a single sentiment reduce over the 5 left.
+    assert merges == [["s0", "s1"], ["s2", "s3"], ["s4", "s5"], ["s6", "s7"]]
+    assert reduces == [["(s0+s1)", "(s2+s3)", "(s4+s5)", "(s6+s7)", "s8"]]
+    assert result.summary == "((s0+s1)+(s2+s3)+(s4+s5)+(s6+s7)+s8)"
+
+
+async def test_merge_asks_for_summary_only(monkeypatch: pytest.MonkeyPatch):
+    calls = []
+
+    async def fake_call_llm(stage, system_prompt, human_prompt, text, response_format, semaphore):
+        calls.append((stage, system_prompt, text, response_format))
+        return response_format(summary="merged")
+
+    monkeypatch.setattr(ai, "_call_llm", fake_call_llm)
+
+    await ai._merge(["a", "b"], semaphore=None)
+
+    assert calls == [("merge", ai._MERGE_SYSTEM_PROMPT, "a\n\nb", ai.MergedSummary)]
+    assert "sentiment" not in ai._MERGE_SYSTEM_PROMPT
+
+
+async def test_tree_reduce_reduces_few_short_summaries_once(monkeypatch: pytest.MonkeyPatch):
+    calls = []
+
+    async def fake_reduce(summaries, semaphore):
+        calls.append(list(summaries))
+        return ai.ReducedOutput(summary="merged", sentiment=5)
+
+    monkeypatch.setattr(ai, "_reduce", fake_reduce)
+
+    await ai._tree_reduce(["a", "b", "c"], semaphore=None)
+
+    assert calls == [["a", "b", "c"]]
+
+
+async def test_rate_limiter_blocks_at_capacity_until_window_passes(monkeypatch: pytest.MonkeyPatch):
+    clock = [100.0]
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(ai.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(ai.asyncio, "sleep", fake_sleep)
+    limiter = ai._RateLimiter(capacity=10, period=60.0)
+
+    await limiter.acquire(6)
+    clock[0] += 15.0
+    await limiter.acquire(4)
+    assert sleeps == []
+
+    # Full: waits until the first acquisition leaves the window, then only
+    # the 4 units from t=115 are still counted.
+    await limiter.acquire(5)
+    assert sleeps == [45.0]
+    assert clock[0] == 160.0
+    assert limiter._used == 9
+
+
+def test_completions_client_is_built_once_without_sdk_retries(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    ai._client.cache_clear()
+    ai._completions_client.cache_clear()
+    try:
+        client = ai._completions_client()
+
+        assert client is ai._completions_client()
+        assert client.max_retries == 0
+        assert ai._client().max_retries > 0
+    finally:
+        ai._client.cache_clear()
+        ai._completions_client.cache_clear()
@@ -3,16 +3,18 @@ Unit tests for the FastAPI application endpoints.
 """
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, AsyncMock, Mock
+from unittest.mock import ANY, patch, AsyncMock, Mock
 from io import BytesIO
 import httpx
+import orjson
 import os
 
 
 @pytest.fixture(autouse=True)
 def _unset_api_token(monkeypatch):
     """Ensure local env doesn't accidentally enable auth during tests."""
-    monkeypatch.delenv("API_TOKEN", raising=False)
+    import api
+    monkeypatch.setattr(api, "_API_TOKEN_BYTES", b"")
 
 
 @pytest.fixture
@@ -42,11 +44,47 @@ def valid_wav_content():
     return wav_header
 
 
+def _slow_deepgram(mock_client_class, transcript=None, error=None):
+    """Make the patched Deepgram client answer (or fail) after a short delay."""
+    import asyncio
+
+    mock_response = Mock()
+    mock_response.content = orjson.dumps({"results": {"paragraphs": {"transcript": transcript}}})
+    mock_response.raise_for_status = Mock()
+
+    async def slow_post(*args, **kwargs):
+        await asyncio.sleep(0.1)
+        # Read the upload late, as a slow network send would.
+        mock_client.sent.append(b"".join([chunk async for chunk in kwargs["content"]]))
+        if error is not None:
+            raise error
+        return mock_response
+
+    mock_client = AsyncMock()
+    mock_client.sent = []
+    mock_client.post = AsyncMock(side_effect=slow_post)
+    mock_client_class.return_value = mock_client
+    return mock_client
+
+
+def _asgi_client():
+    from api import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def _post_wav(ac, content, data):
+    return ac.post(
+        "/api/get_transcription",
+        files={"file": ("test.wav", content, "audio/wav")},
+        data=data,
+    )
+
+
 class TestGetTranscription:
     """Tests for the /api/get_transcription endpoint."""
 
     def test_auth_enabled_missing_token_returns_401(self, client, valid_wav_content):
-        with patch.dict(os.environ, {"API_TOKEN": "secret"}):
+        with patch("api._API_TOKEN_BYTES", b"secret"):
             response = client.post(
                 "/api/get_transcription",
                 files={"file": ("test.wav", valid_wav_content, "audio/wav")},
@@ -56,7 +94,7 @@ class TestGetTranscription:
         assert response.status_code == 401
 
     def test_auth_enabled_wrong_token_returns_401(self, client, valid_wav_content):
-        with patch.dict(os.environ, {"API_TOKEN": "secret"}):
+        with patch("api._API_TOKEN_BYTES", b"secret"):
             response = client.post(
                 "/api/get_transcription",
                 headers={"Authorization": "Bearer wrong"},
@@ -66,12 +104,12 @@ class TestGetTranscription:
 
         assert response.status_code == 401
 
-    @patch('httpx.AsyncClient')
+    @patch('api._http_client')
     def test_auth_enabled_valid_token_allows_request(self, mock_client_class, client, valid_wav_content):
         """When API_TOKEN is set, /api endpoints require a matching token."""
         # Mock the Deepgram API response
         mock_response = Mock()
-        mock_response.json.return_value = {
+        mock_response.content = orjson.dumps({
             "results": {
                 "paragraphs": {"transcript": "SPEAKER 1: Hello world"},
                 "channels": [
@@ -82,7 +120,7 @@ class TestGetTranscription:
                     }
                 ]
             }
-        }
+        })
         mock_response.raise_for_status = Mock()
 
         mock_client = AsyncMock()
@@ -91,7 +129,7 @@ class TestGetTranscription:
         mock_client.__aexit__ = AsyncMock()
         mock_client_class.return_value = mock_client
 
-        with patch.dict(os.environ, {"API_TOKEN": "secret"}):
+        with patch("api._API_TOKEN_BYTES", b"secret"):
             response = client.post(
                 "/api/get_transcription",
                 headers={"Authorization": "Bearer secret"},
@@ -102,7 +140,7 @@ class TestGetTranscription:
         assert response.status_code == 200
 
     def test_docs_not_protected_by_api_token(self, client):
-        with patch.dict(os.environ, {"API_TOKEN": "secret"}):
+        with patch("api._API_TOKEN_BYTES", b"secret"):
             response = client.get("/docs")
 
         assert response.status_code == 200
@@ -119,12 +157,12 @@ class TestGetTranscription:
         assert response.status_code == 400
         assert "uniqueid" in response.json()["detail"]
 
-    @patch('httpx.AsyncClient')
+    @patch('api._http_client')
     def test_valid_wav_file(self, mock_client_class, client, valid_wav_content):
         """Test transcription with a valid WAV file."""
         # Mock the Deepgram API response
         mock_response = Mock()
-        mock_response.json.return_value = {
+        mock_response.content = orjson.dumps({
             "results": {
                 "paragraphs": {"transcript": "SPEAKER 1: Hello world"},
                 "channels": [
@@ -135,7 +173,7 @@ class TestGetTranscription:
                     }
                 ]
             }
-        }
+        })
         mock_response.raise_for_status = Mock()
         
         mock_client = AsyncMock()
@@ -156,14 +194,20 @@ class TestGetTranscription:
         data = response.json()
         assert "transcript" in data
         assert data["transcript"] == "SPEAKER 1: Hello world"
+        sent_headers = mock_client.post.call_args.kwargs["headers"]
+        assert sent_headers["Content-Length"] == str(len(valid_wav_content))
+        sent_params = mock_client.post.call_args.kwargs["params"]
+        assert sent_params["multichannel"] == "true"
+        assert sent_params["model"] == "nova-3"
+        assert "uniqueid" not in sent_params
 
-    @patch('httpx.AsyncClient')
-    def test_persists_raw_transcript_via_threadpool(self, mock_client_class, client, valid_wav_content):
-        """Ensure persistence path uses threadpool helper and forwards kwargs to db layer."""
+    @patch('api._http_client')
+    def test_persists_raw_transcript_via_async_db(self, mock_client_class, client, valid_wav_content):
+        """Ensure persistence path uses the async db helpers and forwards kwargs to them."""
 
         # Mock the Deepgram API response
         mock_response = Mock()
-        mock_response.json.return_value = {
+        mock_response.content = orjson.dumps({
             "results": {
                 "paragraphs": {"transcript": "SPEAKER 1: Hello world"},
                 "channels": [
@@ -174,7 +218,7 @@ class TestGetTranscription:
                     }
                 ]
             }
-        }
+        })
         mock_response.raise_for_status = Mock()
 
         mock_client = AsyncMock()
@@ -183,15 +227,11 @@ class TestGetTranscription:
         mock_client.__aexit__ = AsyncMock()
         mock_client_class.return_value = mock_client
 
-        async def fake_run_in_threadpool(func, *args, **kwargs):
-            return func(*args, **kwargs)
-
-        with patch.dict(os.environ, {"OPENAI_API_KEY": ""}), \
+        with patch("api.OPENAI_ENABLED", False), \
              patch("api.db.is_configured", return_value=True), \
-             patch("api.db.upsert_transcript_progress", return_value=123) as progress_mock, \
-             patch("api.db.upsert_transcript_raw", return_value=123) as upsert_mock, \
-             patch("api.db.set_transcript_state") as state_mock, \
-             patch("api.run_in_threadpool", new=fake_run_in_threadpool):
+             patch("api.db.aupsert_transcript_progress", return_value=123) as progress_mock, \
+             patch("api.db.aupsert_transcript_raw", return_value=123) as upsert_mock, \
+             patch("api.db.aset_transcript_state") as state_mock:
             response = client.post(
                 "/api/get_transcription",
                 files={"file": ("test.wav", valid_wav_content, "audio/wav")},
@@ -200,12 +240,192 @@ class TestGetTranscription:
 
         assert response.status_code == 200
 
-        progress_mock.assert_called_once_with(uniqueid="1234567890.1234")
-        upsert_mock.assert_called_once_with(
+        progress_mock.assert_awaited_once_with(uniqueid="1234567890.1234")
+        upsert_mock.assert_awaited_once_with(
             uniqueid="1234567890.1234",
             raw_transcription="SPEAKER 1: Hello world",
+            final_state="done",
+        )
+        state_mock.assert_not_awaited()
+
+    @patch('api._http_client')
+    def test_channel_names_replace_channel_labels(self, mock_client_class, client, valid_wav_content):
+        mock_response = Mock()
+        mock_response.content = orjson.dumps({
+            "results": {"paragraphs": {"transcript": "Channel 0: Hi\n\nChannel 1: Hello\n\nChannel 0: Bye"}}
+        })
+        mock_response.raise_for_status = Mock()
+        mock_client = AsyncMock()
+        mock_client.post = AsyncMock(return_value=mock_response)
+        mock_client_class.return_value = mock_client
+
+        response = client.post(
+            "/api/get_transcription",
+            files={"file": ("test.wav", valid_wav_content, "audio/wav")},
+            data={"channel0_name": "Alice"},
+        )
+
+        assert response.status_code == 200
+        assert response.json()["transcript"] == "Alice: Hi\n\nChannel 1: Hello\n\nAlice: Bye"
+
+    @patch('api._http_client')
+    def test_params_from_query_string_with_file_only_form(self, mock_client_class, client, valid_wav_content):
+        mock_response = Mock()
+        mock_response.content = orjson.dumps({
+            "results": {"paragraphs": {"transcript": "Channel 1: Hello"}}
+        })
+        mock_response.raise_for_status = Mock()
+        mock_client = AsyncMock()
+        mock_client.post = AsyncMock(return_value=mock_response)
+        mock_client_class.return_value = mock_client
+
+        response = client.post(
+            "/api/get_transcription?channel1_name=Bob&language=it",
+            files={"file": ("test.wav", valid_wav_content, "audio/wav")},
+        )
+
+        assert response.status_code == 200
+        assert response.json()["transcript"] == "Bob: Hello"
+        assert mock_client.post.call_args.kwargs["params"]["language"] == "it"
+
+    @patch('api._run_call_processor')
+    @patch('api._http_client')
+    def test_enrichment_runs_as_background_task(self, mock_client_class, mock_run, client, valid_wav_content):
+        mock_response = Mock()
+        mock_response.content = orjson.dumps({
+            "results": {"paragraphs": {"transcript": "SPEAKER 1: Hello world"}}
+        })
+        mock_response.raise_for_status = Mock()
+        mock_client = AsyncMock()
+        mock_client.post = AsyncMock(return_value=mock_response)
+        mock_client_class.return_value = mock_client
+
+        with patch("api.OPENAI_ENABLED", True), \
+             patch("api.db.is_configured", return_value=True), \
+             patch("api.db.aupsert_transcript_progress", return_value=123), \
+             patch("api.db.aupsert_transcript_raw", return_value=123) as upsert_mock, \
+             patch("api.db.aset_transcript_state") as state_mock:
+            response = client.post(
+                "/api/get_transcription",
+                files={"file": ("test.wav", valid_wav_content, "audio/wav")},
+                data={"uniqueid": "1234567890.1234", "persist": "true", "summary": "true"},
+            )
+
+        assert response.status_code == 200
+        assert upsert_mock.await_args.kwargs["final_state"] == "summarizing"
+        mock_run.assert_awaited_once()
+        assert mock_run.await_args.kwargs == {
+            "transcript_id": 123,
+            "raw_transcription": "SPEAKER 1: Hello world",
+            "summary": True,
+        }
+        # The call processor sets "done" itself.
+        state_mock.assert_not_awaited()
+
+    @patch('api._http_client')
+    async def test_concurrent_uploads_of_same_call_share_one_deepgram_request(
+        self, mock_client_class, valid_wav_content
+    ):
+        import asyncio
+
+        mock_client = _slow_deepgram(mock_client_class, "SPEAKER 1: Hello world")
+
+        with patch("api.db.is_configured", return_value=False):
+            async with _asgi_client() as ac:
+                responses = await asyncio.gather(*(
+                    _post_wav(ac, valid_wav_content, {"uniqueid": "1234567890.1234", "persist": "true"})
+                    for _ in range(2)
+                ))
+
+        assert [r.status_code for r in responses] == [200, 200]
+        assert all(r.json()["transcript"] == "SPEAKER 1: Hello world" for r in responses)
+        mock_client.post.assert_awaited_once()
+
+    @patch('api._http_client')
+    async def test_concurrent_uploads_with_different_params_do_not_join(
+        self, mock_client_class, valid_wav_content
+    ):
+        import asyncio
+
+        mock_client = _slow_deepgram(mock_client_class, "Channel 0: Hello")
+
+        with patch("api.db.is_configured", return_value=False):
+            async with _asgi_client() as ac:
+                responses = await asyncio.gather(*(
+                    _post_wav(
+                        ac,
+                        valid_wav_content,
+                        {"uniqueid": "1234567890.1234", "persist": "true", "channel0_name": name},
+                    )
+                    for name in ("Alice", "Bob")
+                ))
+
+        assert [r.json()["transcript"] for r in responses] == ["Alice: Hello", "Bob: Hello"]
+        assert mock_client.post.await_count == 2
+
+    @patch('api._http_client')
+    async def test_cancelled_first_upload_still_answers_joiners(self, mock_client_class, valid_wav_content):
+        import asyncio
+        import api
+
+        mock_client = _slow_deepgram(mock_client_class, "SPEAKER 1: Hello world")
+        data = {"uniqueid": "1234567890.1234", "persist": "true"}
+
+        with patch("api.db.is_configured", return_value=False):
+            async with _asgi_client() as ac:
+                first = asyncio.create_task(_post_wav(ac, valid_wav_content, data))
+                await asyncio.sleep(0.05)
+                second = asyncio.create_task(_post_wav(ac, valid_wav_content, data))
+                await asyncio.sleep(0.01)
+                first.cancel()
+                response = await second
+
+        # The first request's upload was closed when it was cancelled; the
+        # shared transcription still streamed the whole file.
+        assert first.cancelled()
+        assert mock_client.sent == [valid_wav_content]
+        assert response.status_code == 200
+        assert response.json()["transcript"] == "SPEAKER 1: Hello world"
+        mock_client.post.assert_awaited_once()
+        assert api._INFLIGHT_TRANSCRIPTIONS == {}
+
+    @patch('api._http_client')
+    async def test_failed_first_upload_fails_joiners_and_clears_inflight(
+        self, mock_client_class, valid_wav_content
+    ):
+        import asyncio
+        import api
+
+        error_response = Mock()
+        error_response.status_code = 502
+        error_response.text = "upstream down"
+        mock_client = _slow_deepgram(
+            mock_client_class,
+            error=httpx.HTTPStatusError("Bad Gateway", request=Mock(), response=error_response),
         )
-        state_mock.assert_any_call(transcript_id=123, state="done")
+
+        with patch("api.db.is_configured", return_value=False):
+            async with _asgi_client() as ac:
+                responses = await asyncio.gather(*(
+                    _post_wav(ac, valid_wav_content, {"uniqueid": "1234567890.1234", "persist": "true"})
+                    for _ in range(2)
+                ))
+
+        assert [r.status_code for r in responses] == [502, 502]
+        assert responses[0].json() == responses[1].json()
+        mock_client.post.assert_awaited_once()
+        assert api._INFLIGHT_TRANSCRIPTIONS == {}
+
+    @patch('api._http_client')
+    def test_upload_over_limit_returns_413(self, mock_client_class, client, valid_wav_content):
+        with patch("api.MAX_UPLOAD_BYTES", 16):
+            response = client.post(
+                "/api/get_transcription",
+                files={"file": ("test.wav", valid_wav_content, "audio/wav")},
+            )
+
+        assert response.status_code == 413
+        mock_client_class.assert_not_called()
 
     def test_invalid_file_type(self, client):
         """Test that non-WAV files are rejected."""
@@ -217,7 +437,19 @@ class TestGetTranscription:
         assert response.status_code == 400
         assert "Invalid file type" in response.json()["detail"]
 
-    @patch('httpx.AsyncClient')
+    @patch('api._http_client')
+    def test_invalid_wav_header(self, mock_client_class, client):
+        """Test that files without a RIFF/WAVE header are rejected before calling Deepgram."""
+        response = client.post(
+            "/api/get_transcription",
+            files={"file": ("test.wav", b"not really a wav file", "audio/wav")}
+        )
+
+        assert response.status_code == 400
+        assert "Invalid file content" in response.json()["detail"]
+        mock_client_class.assert_not_called()
+
+    @patch('api._http_client')
     def test_deepgram_api_error(self, mock_client_class, client, valid_wav_content):
         """Test handling of Deepgram API errors."""
         # Mock an HTTP error from Deepgram
@@ -246,7 +478,22 @@ class TestGetTranscription:
         assert response.status_code == 401
         assert "Deepgram API error" in response.json()["detail"]
 
-    @patch('httpx.AsyncClient')
+    @patch('api._http_client')
+    def test_deepgram_busy_returns_503(self, mock_client_class, client, valid_wav_content):
+        """Test that requests beyond DEEPGRAM_MAX_INFLIGHT are rejected without calling Deepgram."""
+        import asyncio
+
+        with patch("api._DEEPGRAM_INFLIGHT", asyncio.Semaphore(0)):
+            response = client.post(
+                "/api/get_transcription",
+                files={"file": ("test.wav", valid_wav_content, "audio/wav")},
+                data={"uniqueid": "1234567890.1234"},
+            )
+
+        assert response.status_code == 503
+        mock_client_class.assert_not_called()
+
+    @patch('api._http_client')
     def test_deepgram_timeout_returns_504(self, mock_client_class, client, valid_wav_content):
         """Test that Deepgram timeouts are mapped to 504 Gateway Timeout."""
         mock_client = AsyncMock()
@@ -266,12 +513,12 @@ class TestGetTranscription:
         assert response.status_code == 504
         assert "timed out" in response.json()["detail"].lower()
 
-    @patch('httpx.AsyncClient')
+    @patch('api._http_client')
     def test_malformed_deepgram_response(self, mock_client_class, client, valid_wav_content):
         """Test handling of malformed responses from Deepgram."""
         # Mock a response with missing fields
         mock_response = Mock()
-        mock_response.json.return_value = {"results": {}}
+        mock_response.content = orjson.dumps({"results": {}})
         mock_response.raise_for_status = Mock()
         
         mock_client = AsyncMock()
@@ -289,12 +536,12 @@ class TestGetTranscription:
         assert response.status_code == 500
         assert "Failed to parse transcription response" in response.json()["detail"]
 
-    @patch('httpx.AsyncClient')
+    @patch('api._http_client')
     def test_missing_paragraphs_transcript_is_error(self, mock_client_class, client, valid_wav_content):
         """Diarized-only: missing paragraphs transcript returns 500."""
         # Mock response without paragraphs transcript
         mock_response = Mock()
-        mock_response.json.return_value = {
+        mock_response.content = orjson.dumps({
             "results": {
                 "channels": [
                     {
@@ -304,7 +551,7 @@ class TestGetTranscription:
                     }
                 ]
             }
-        }
+        })
         mock_response.raise_for_status = Mock()
         
         mock_client = AsyncMock()
@@ -322,6 +569,139 @@ class TestGetTranscription:
         assert response.status_code == 500
         assert "Failed to parse transcription response" in response.json()["detail"]
 
+    @patch("api._process_call")
+    def test_long_transcript_reaches_call_processor_via_shared_memory(self, mock_process):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        import api
+
+        raw = "Channel 0: perché sì. " * 5000
+        with ThreadPoolExecutor(max_workers=1) as pool, patch("api._call_pool", return_value=pool):
+            asyncio.run(api._run_call_processor(None, transcript_id=7, raw_transcription=raw, summary=True))
+
+        mock_process.assert_called_once_with(7, raw, True, ANY)
+
+    def test_timed_out_worker_does_not_overwrite_failed_state(self, monkeypatch):
+        import asyncio
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        import api
+        import db
+
+        row = {"state": "summarizing"}
+
+        class Conn:
+            """Applies UPDATE ... SET state = %s, honouring the summarizing guard."""
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params):
+                if "state = 'summarizing'" not in sql or row["state"] == "summarizing":
+                    row["state"] = params[0]
+
+        def slow_process(transcript_id, raw_transcription, summary, deadline):
+            time.sleep(0.3)
+            db.finalize_transcript(transcript_id=transcript_id, chunks=[], vectors=[], state="done")
+
+        async def mark_failed(transcript_id):
+            row["state"] = "failed"
+
+        monkeypatch.setattr(db, "_ensure_schema", lambda: None)
+        monkeypatch.setattr(db, "_connect", lambda: Conn())
+        monkeypatch.setattr(api, "_process_call", slow_process)
+        monkeypatch.setattr(api, "_mark_failed", mark_failed)
+        monkeypatch.setattr(api, "CALL_PROCESSOR_TIMEOUT_SECONDS", 0.05)
+
+        with ThreadPoolExecutor(max_workers=1) as pool, patch("api._call_pool", return_value=pool), patch(
+            "api._recycle_call_pool"
+        ) as recycle:
+            asyncio.run(api._enrich_transcript(None, transcript_id=7, raw_transcription="hi", summary=True))
+            assert row["state"] == "failed"
+        # The running job holds a worker: its pool is recycled.
+        recycle.assert_called_once_with(None, pool)
+        # The worker has finished by now; its late "done" must not win.
+        assert row["state"] == "failed"
+
+    def test_timed_out_queued_job_is_cancelled_without_recycling(self, monkeypatch):
+        import asyncio
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        import api
+
+        release = threading.Event()
+        started = []
+
+        def process(transcript_id, raw_transcription, summary, deadline):
+            started.append(transcript_id)
+            release.wait(5)
+
+        monkeypatch.setattr(api, "_process_call", process)
+        monkeypatch.setattr(api, "CALL_PROCESSOR_TIMEOUT_SECONDS", 0.05)
+
+        with ThreadPoolExecutor(max_workers=1) as pool, patch("api._call_pool", return_value=pool), patch(
+            "api._recycle_call_pool"
+        ) as recycle:
+            busy = pool.submit(process, 1, "hi", True, 0)
+            with pytest.raises(TimeoutError):
+                asyncio.run(api._run_call_processor(None, transcript_id=7, raw_transcription="hi", summary=True))
+            release.set()
+            busy.result()
+
+        assert started == [1]
+        recycle.assert_not_called()
+
+    def test_recycle_call_pool_replaces_and_terminates_the_stuck_pool(self):
+        from types import SimpleNamespace
+        import api
+
+        stuck = Mock(spec=["shutdown", "_processes"])
+        worker = Mock()
+        stuck._processes = {1: worker}
+        app = SimpleNamespace(state=SimpleNamespace(call_pool=stuck))
+
+        with patch("api._new_call_pool", return_value="fresh") as new_pool:
+            api._recycle_call_pool(app, stuck)
+
+        assert app.state.call_pool == "fresh"
+        new_pool.assert_called_once_with()
+        worker.terminate.assert_called_once_with()
+        stuck.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+
+
+class TestRequestParams:
+    async def test_form_fields_override_query_and_exclude_file(self):
+        from api import _request_params
+        from starlette.datastructures import FormData, QueryParams, UploadFile
+
+        request = Mock()
+        request.form = AsyncMock(return_value=FormData([
+            ("file", UploadFile(BytesIO(b""), filename="test.wav")),
+            ("uniqueid", "form-id"),
+            ("channel0_name", UploadFile(BytesIO(b"Alice"), filename="name.txt")),
+        ]))
+        request.query_params = QueryParams("uniqueid=query-id&persist=true")
+
+        params = await _request_params(request)
+
+        assert dict(params) == {"uniqueid": "form-id", "persist": "true"}
+        assert "file" not in params
+        assert "channel0_name" not in params
+
+    async def test_http_errors_from_form_parsing_propagate(self):
+        from api import _request_params
+        from fastapi import HTTPException
+
+        request = Mock()
+        request.form = AsyncMock(side_effect=HTTPException(status_code=413, detail="Upload too large"))
+
+        with pytest.raises(HTTPException) as exc_info:
+            await _request_params(request)
+        assert exc_info.value.status_code == 413
+
 
 class TestGetSpeech:
     """Tests for the /api/get_speech endpoint."""
@@ -344,13 +724,13 @@ class TestGetSpeech:
         assert all(model.endswith("-it") for model in models)
 
     def test_get_models_auth_enabled_requires_token(self, client):
-        with patch.dict(os.environ, {"API_TOKEN": "secret"}):
+        with patch("api._API_TOKEN_BYTES", b"secret"):
             response = client.get("/api/get_models")
 
         assert response.status_code == 401
 
     def test_get_models_auth_enabled_valid_token(self, client):
-        with patch.dict(os.environ, {"API_TOKEN": "secret"}):
+        with patch("api._API_TOKEN_BYTES", b"secret"):
             response = client.get("/api/get_models", headers={"Authorization": "Bearer secret"})
 
         assert response.status_code == 200
@@ -422,6 +802,16 @@ class TestGetSpeech:
         assert response.content == b"AAABBB"
         assert mock_tts.call_count == 2
 
+    @patch("api._concat_and_boost_mp3_ffmpeg", new_callable=AsyncMock, return_value=b"MP3DATA")
+    @patch("api._tts_chunk_to_bytes_sync", side_effect=lambda text, options: text[:1].encode())
+    def test_get_speech_keeps_chunk_order(self, mock_tts, mock_ffmpeg, client):
+        text = " ".join(letter * 1999 for letter in "abc")
+        response = client.post("/api/get_speech", data={"text": text})
+
+        assert response.status_code == 200
+        assert mock_tts.call_count == 3
+        assert mock_ffmpeg.call_args[0][0] == [b"a", b"b", b"c"]
+
     @patch("api._concat_and_boost_mp3_ffmpeg", new_callable=AsyncMock, return_value=b"MP3DATA")
     @patch("api._tts_chunk_to_bytes_sync", return_value=b"MP3DATA")
     def test_get_speech_ignores_unknown_params(self, mock_tts, mock_ffmpeg, client):
@@ -482,6 +872,16 @@ class TestGetSpeech:
         assert options.encoding == "mp3"
         assert not options.container
 
+    @patch("api._tts_chunk_to_bytes_sync", return_value=b"MP3DATA")
+    def test_get_speech_returns_503_when_deepgram_slots_exhausted(self, mock_tts, client):
+        import asyncio
+
+        with patch("api._DEEPGRAM_INFLIGHT", asyncio.Semaphore(0)):
+            response = client.post("/api/get_speech", data={"text": "hello"})
+
+        assert response.status_code == 503
+        mock_tts.assert_not_called()
+
     def test_get_speech_missing_text_returns_400(self, client):
         response = client.post("/api/get_speech", data={})
         assert response.status_code == 400
@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
@@ -170,6 +170,62 @@ async def test_upsert_transcript_raw_raises_when_no_row(monkeypatch: pytest.Monk
         )
 
 
+def _make_aconn(*, fetchone_result=(123,)):
+    """Create a psycopg AsyncConnection-like mock used as an async context manager."""
+    conn = MagicMock(name="aconn")
+    conn.__aenter__ = AsyncMock(return_value=conn)
+    conn.__aexit__ = AsyncMock(return_value=False)
+    cursor = MagicMock(name="cursor")
+    cursor.fetchone = AsyncMock(return_value=fetchone_result)
+    conn.execute = AsyncMock(return_value=cursor)
+    return conn
+
+
+@pytest.mark.asyncio
+async def test_aupsert_transcript_raw_returns_id(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(db, "_schema_initialized", True)
+
+    conn = _make_aconn(fetchone_result=(42,))
+    monkeypatch.setattr(db, "_aconnect", AsyncMock(return_value=conn))
+
+    transcript_id = await db.aupsert_transcript_raw(
+        uniqueid="1234567890.1234",
+        raw_transcription="hello",
+        final_state="done",
+    )
+
+    assert transcript_id == 42
+    conn.execute.assert_awaited_once_with(db._UPSERT_RAW_SQL, ("1234567890.1234", "hello", "done", "done"))
+
+
+@pytest.mark.asyncio
+async def test_aset_transcript_state_uses_pool_when_open(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(db, "_schema_initialized", True)
+
+    conn = _make_aconn()
+    pool = MagicMock(name="pool")
+    pool.connection = MagicMock(return_value=conn)
+    monkeypatch.setattr(db, "_apool", pool)
+    connect_mock = AsyncMock()
+    monkeypatch.setattr(db, "_aconnect", connect_mock)
+
+    await db.aset_transcript_state(transcript_id=7, state="done")
+
+    conn.execute.assert_awaited_once_with(db._SET_STATE_SQL, ("done", 7))
+    connect_mock.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_aset_transcript_state_rejects_invalid_state(monkeypatch: pytest.MonkeyPatch):
+    connect_mock = AsyncMock()
+    monkeypatch.setattr(db, "_aconnect", connect_mock)
+
+    with pytest.raises(ValueError):
+        await db.aset_transcript_state(transcript_id=1, state="bogus")
+
+    connect_mock.assert_not_called()
+
+
 @pytest.mark.asyncio
 async def test_update_transcript_ai_fields_executes_update(monkeypatch: pytest.MonkeyPatch):
     monkeypatch.setattr(db, "_ensure_schema", lambda: None)
@@ -190,6 +246,80 @@ async def test_update_transcript_ai_fields_executes_update(monkeypatch: pytest.M
     assert "UPDATE transcripts" in executed_sql
 
 
+def test_update_transcript_ai_fields_sets_state_in_same_update(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(db, "_ensure_schema", lambda: None)
+
+    conn = _make_conn()
+    monkeypatch.setattr(db, "_connect", MagicMock(return_value=conn))
+
+    db.update_transcript_ai_fields(
+        transcript_id=10,
+        cleaned_transcription="clean",
+        summary="sum",
+        sentiment=7,
+        state="done",
+    )
+
+    conn.execute.assert_called_once()
+    assert conn.execute.call_args.args[1] == ("clean", "sum", 7, "done", 10)
+
+
+def test_find_transcript_enrichment_looks_up_by_digest(monkeypatch: pytest.MonkeyPatch):
+    import hashlib
+
+    monkeypatch.setattr(db, "_ensure_schema", lambda: None)
+    conn = _make_conn(fetchone_result=("clean", "sum", 4))
+    monkeypatch.setattr(db, "_connect_without_pgvector", MagicMock(return_value=conn))
+
+    assert db.find_transcript_enrichment("hello") == ("clean", "sum", 4)
+    conn.execute.assert_called_once_with(
+        db._FIND_ENRICHMENT_SQL,
+        (hashlib.md5(b"hello").hexdigest(), "hello"),
+    )
+
+
+def test_finalize_transcript_writes_everything_in_one_connection(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(db, "_ensure_schema", lambda: None)
+
+    conn = _make_conn()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    connect_mock = MagicMock(return_value=conn)
+    monkeypatch.setattr(db, "_connect", connect_mock)
+
+    db.finalize_transcript(
+        transcript_id=5,
+        chunks=["a", "b"],
+        vectors=[[0.1], [0.2]],
+        enrichment=("clean", "sum", 6),
+        state="done",
+    )
+
+    connect_mock.assert_called_once()
+    cursor.executemany.assert_called_once_with(
+        db._INSERT_CHUNK_SQL,
+        [(5, 0, "a", [0.1]), (5, 1, "b", [0.2])],
+    )
+    executed = [call.args for call in conn.execute.call_args_list]
+    assert executed == [
+        (db._DELETE_CHUNKS_SQL, (5,)),
+        (db._FINALIZE_AI_FIELDS_SQL, ("clean", "sum", 6, "done", 5)),
+    ]
+
+
+def test_finalize_transcript_state_only_replaces_summarizing(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(db, "_ensure_schema", lambda: None)
+
+    conn = _make_conn()
+    monkeypatch.setattr(db, "_connect", MagicMock(return_value=conn))
+
+    db.finalize_transcript(transcript_id=5, chunks=[], vectors=[], state="done")
+
+    conn.execute.assert_called_once_with(db._FINALIZE_STATE_SQL, ("done", 5))
+    # A job the API already marked 'failed' (e.g. on timeout) keeps that state.
+    assert "AND state = 'summarizing'" in db._FINALIZE_STATE_SQL
+    assert "WHEN state = 'summarizing'" in db._FINALIZE_AI_FIELDS_SQL
+
+
 @pytest.mark.asyncio
 async def test_split_text_for_embedding_filters_empty(monkeypatch: pytest.MonkeyPatch):
     class StubSplitter:
@@ -261,4 +391,7 @@ async def test_replace_transcript_embeddings_deletes_and_inserts(monkeypatch: py
 
     executed_sql = "\n".join(str(call.args[0]) for call in conn.execute.call_args_list)
     assert "DELETE FROM transcript_chunks" in executed_sql
-    assert "INSERT INTO transcript_chunks" in executed_sql
+    cursor = conn.cursor.return_value.__enter__.return_value
+    insert_sql, rows = cursor.executemany.call_args.args
+    assert "INSERT INTO transcript_chunks" in insert_sql
+    assert len(rows) == 2